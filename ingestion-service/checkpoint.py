@@ -0,0 +1,91 @@
+"""
+Ingestion Checkpoint Log
+------------------------
+Records which patterns have been fully ingested, and the content hash they were
+ingested from. Pipelines compare a freshly fetched page's hash with the stored
+one and skip unchanged patterns, so both resumed and routine re-runs avoid
+re-paying LLM/GCS/Search costs for content that is already indexed.
+
+SYSTEM DESIGN NOTE: Single Append-Only File
+-------------------------------------------
+All completions go to one file, `<checkpoint_dir>/completed.log`, one
+`<pattern_id>\t<content_hash>` entry per line, instead of one marker file per
+pattern. If a pattern is recorded more than once, the last entry wins.
+- Startup reads the file once into an in-memory map; lookups never touch the
+  filesystem.
+- `mark_completed` is a single O_APPEND write + fdatasync on an already-open
+  descriptor, serialized by a process-wide lock (workers run on threads).
+- A crash mid-write can only leave a torn final line. Lines without a trailing
+  newline are discarded (and truncated) on the next startup, so a partial ID is
+  never mistaken for a completed pattern.
+
+Delete the file to force a full re-ingestion.
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# fdatasync is POSIX-only; fall back to fsync elsewhere.
+_sync = getattr(os, "fdatasync", os.fsync)
+
+
+class CheckpointLog:
+    """Append-only journal of completed pattern IDs and their content hashes."""
+
+    FILENAME = "completed.log"
+
+    def __init__(self, checkpoint_dir: str):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.path = os.path.join(checkpoint_dir, self.FILENAME)
+        self._lock = threading.Lock()
+        self._completed = self.load_completed()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        logger.info(f"Checkpoint log {self.path}: {len(self._completed)} patterns already completed")
+
+    def load_completed(self) -> Dict[str, str]:
+        """Reads the log once, dropping any torn trailing line left by a crash."""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+
+        complete_len = data.rfind(b"\n") + 1
+        if complete_len < len(data):
+            logger.warning(f"Discarding torn checkpoint entry at end of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(complete_len)
+
+        completed: Dict[str, str] = {}
+        for line in data[:complete_len].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            pattern_id, _, content_hash = line.partition("\t")
+            completed[pattern_id.strip()] = content_hash.strip()
+        return completed
+
+    def is_completed(self, pattern_id: str) -> bool:
+        return pattern_id in self._completed
+
+    def stored_hash(self, pattern_id: str) -> Optional[str]:
+        """Content hash recorded at the pattern's last completion, if any."""
+        return self._completed.get(pattern_id) or None
+
+    def mark_completed(self, pattern_id: str, content_hash: str = ""):
+        """Durably records *pattern_id* as completed with *content_hash*."""
+        with self._lock:
+            if self._completed.get(pattern_id) == content_hash:
+                return
+            os.write(self._fd, f"{pattern_id}\t{content_hash}\n".encode("utf-8"))
+            _sync(self._fd)
+            self._completed[pattern_id] = content_hash
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
@@ -13,12 +13,29 @@ Key Responsibilities:
 
 import msal
 import requests
+from requests.adapters import HTTPAdapter
 import logging
+import random
 import time
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Leading bytes of the raster formats a diagram can be stored in (PNG, JPEG,
+# GIF, WebP's RIFF container). Anything else, such as an HTML error page or an
+# SVG icon, is rejected from the first chunk instead of being downloaded whole.
+_IMAGE_SIGNATURES = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"RIFF")
+
+
+def _backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff (1s, 2s, 4s, ...) with +/-50% jitter.
+
+    Workers that hit the same throttling or outage at the same moment would
+    otherwise all retry in lock-step and collide again.
+    """
+    return (2 ** attempt) * random.uniform(0.5, 1.5)
+
 
 class SharePointClient:
     """
@@ -33,11 +50,38 @@ class SharePointClient:
     
     # Token refresh buffer - refresh 5 minutes before expiry to be safe
     TOKEN_REFRESH_BUFFER_SECONDS = 300
+
+    # Keep-alive connections held open to graph.microsoft.com. Sized for the
+    # pipelines' fetch and image worker pools so concurrent downloads reuse
+    # sockets instead of opening (and TLS-handshaking) a new one each time.
+    HTTP_POOL_SIZE = 20
+
+    # Images smaller than this (by Content-Length) are icons or spacers, not
+    # diagrams, and are skipped without reading the body.
+    MIN_IMAGE_BYTES = 1024
+    # First read of an image body; enough to check its signature.
+    IMAGE_HEAD_BYTES = 64 * 1024
+
+    # List columns actually read from each list. Passed as a field projection
+    # (`expand=fields(select=...)`) so Graph does not return every column of
+    # every item, e.g. page-level metadata and rich-text columns we never use.
+    PATTERN_LIST_FIELDS = (
+        "PatternID", "Title", "MaturityLevel", "UsageCount", "PatternLink",
+        "Status", "OwnerGroup", "PatternCategory", "ContentHash",
+    )
+    HADR_LIST_FIELDS = ("ServiceName", "Title", "ServiceDescription", "ServiceType", "HADRPageLink")
+    PAGE_FIELDS = ("CanvasContent1",)
     
     def __init__(self, config):
         self.cfg = config
         self.access_token = None
         self.token_expires_at = None
+
+        # One pooled HTTP session for every Graph call (page lists, page HTML,
+        # image downloads). Retries are handled by _get_with_retry, not urllib3.
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.HTTP_POOL_SIZE)
+        self._http.mount("https://", adapter)
         
         # Initialize MSAL Confidential Client
         # This is the standard library for MS identity platform
@@ -97,31 +141,36 @@ class SharePointClient:
         self._ensure_valid_token()
         return {"Authorization": f"Bearer {self.access_token}"}
     
-    def _get_with_retry(self, url: str, max_retries: int = 3) -> requests.Response:
+    def _get_with_retry(self, url: str, max_retries: int = 3, stream: bool = False) -> requests.Response:
         """
         Executes a GET request with built-in resilience.
+
+        With ``stream=True`` only the headers have been read when the response
+        is returned; the caller reads (or abandons) the body.
         
         SYSTEM DESIGN NOTE: Error Handling Strategy
         -------------------------------------------
         - 429 (Too Many Requests): Respects the 'Retry-After' header from Microsoft.
-        - 503 (Service Unavailable): Uses exponential backoff (2s, 4s, 8s).
-        - Timeout: Catches and retries.
+        - 503 (Service Unavailable): Uses jittered exponential backoff (~1s, 2s, 4s).
+        - Timeout: Catches and retries, with the same backoff.
         """
         for attempt in range(max_retries):
             try:
-                response = requests.get(url, headers=self.get_headers(), timeout=30)
+                response = self._http.get(url, headers=self.get_headers(), timeout=30, stream=stream)
                 
                 # Handle Rate Limiting (Throttling)
                 if response.status_code == 429:
                     retry_after = int(response.headers.get('Retry-After', 60))
+                    response.close()
                     logger.warning(f"Rate limited (429), waiting {retry_after}s...")
                     time.sleep(retry_after)
                     continue
                 
                 # Handle Transient Server Errors
                 if response.status_code == 503:
-                    wait_time = 2 ** attempt # Exponential backoff
-                    logger.warning(f"Service unavailable (503), retrying in {wait_time}s...")
+                    wait_time = _backoff_delay(attempt)
+                    response.close()
+                    logger.warning(f"Service unavailable (503), retrying in {wait_time:.1f}s...")
                     time.sleep(wait_time)
                     continue
                 
@@ -131,8 +180,8 @@ class SharePointClient:
                 
             except requests.exceptions.Timeout:
                 if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    logger.warning(f"Request timeout, retrying in {wait_time}s...")
+                    wait_time = _backoff_delay(attempt)
+                    logger.warning(f"Request timeout, retrying in {wait_time:.1f}s...")
                     time.sleep(wait_time)
                 else:
                     raise
@@ -140,8 +189,8 @@ class SharePointClient:
             except requests.exceptions.RequestException as e:
                 # Catch-all for other network errors
                 if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    logger.warning(f"Request failed: {e}, retrying in {wait_time}s...")
+                    wait_time = _backoff_delay(attempt)
+                    logger.warning(f"Request failed: {e}, retrying in {wait_time:.1f}s...")
                     time.sleep(wait_time)
                 else:
                     raise
@@ -154,11 +203,15 @@ class SharePointClient:
         
         Concepts:
         - OData Query: We use `?expand=fields` because custom columns in SharePoint are often
-          nested inside a 'fields' object in the JSON response.
+          nested inside a 'fields' object in the JSON response. The expansion is projected
+          to PATTERN_LIST_FIELDS and the item itself to its `id`.
         - Pagination: The Graph API default page size is usually small (e.g., 20 items).
           We must manually follow the `@odata.nextLink` to get the full dataset.
         """
-        url = f"https://graph.microsoft.com/v1.0/sites/{self.cfg.SP_SITE_ID}/lists/{self.cfg.SP_LIST_ID}/items?expand=fields"
+        url = (
+            f"https://graph.microsoft.com/v1.0/sites/{self.cfg.SP_SITE_ID}/lists/{self.cfg.SP_LIST_ID}"
+            f"/items?select=id&expand=fields(select={','.join(self.PATTERN_LIST_FIELDS)})"
+        )
         patterns = []
         
         logging.info("Starting pattern catalog fetch...")
@@ -218,7 +271,8 @@ class SharePointClient:
         """
         url = (
             f"https://graph.microsoft.com/v1.0/sites/{self.cfg.SP_SITE_ID}"
-            f"/lists/{self.cfg.SP_HADR_LIST_ID}/items?expand=fields"
+            f"/lists/{self.cfg.SP_HADR_LIST_ID}/items"
+            f"?select=id&expand=fields(select={','.join(self.HADR_LIST_FIELDS)})"
         )
         services = []
 
@@ -263,7 +317,8 @@ class SharePointClient:
         
         Technical Detail:
         - SharePoint pages are files stored in the "SitePages" library.
-        - The actual HTML content (text typed by users) is stored in a hidden field called `CanvasContent1`.
+        - The actual HTML content (text typed by users) is stored in a hidden field called `CanvasContent1`,
+          which is the only field requested.
         - We query by filename (`FileLeafRef`) to find the list item, then read that field.
         """
         # 1. Parse filename from URL (e.g. "https://.../SitePages/MyPattern.aspx" -> "MyPattern.aspx")
@@ -274,7 +329,11 @@ class SharePointClient:
         library = getattr(self.cfg, 'SP_PAGES_LIBRARY', 'SitePages')
         
         # 2. OData Filter Query: Find the file where name equals our filename
-        query_url = f"https://graph.microsoft.com/v1.0/sites/{self.cfg.SP_SITE_ID}/lists/{library}/items?filter=fields/FileLeafRef eq '{filename}'&expand=fields"
+        query_url = (
+            f"https://graph.microsoft.com/v1.0/sites/{self.cfg.SP_SITE_ID}/lists/{library}/items"
+            f"?filter=fields/FileLeafRef eq '{filename}'"
+            f"&select=id&expand=fields(select={','.join(self.PAGE_FIELDS)})"
+        )
         
         resp = self._get_with_retry(query_url)
         data = resp.json()
@@ -290,6 +349,10 @@ class SharePointClient:
     def download_image(self, image_source_url):
         """
         Downloads a binary image file from SharePoint Drive.
+
+        The body is streamed: responses whose Content-Length is below
+        MIN_IMAGE_BYTES, or whose first bytes are not a known raster image
+        signature, are abandoned (returning None) without reading the rest.
         """
         # image_source_url is usually relative: /sites/mysite/SiteAssets/img.png
         # We need to construct the Graph download URL pointing to the 'content' stream
@@ -297,9 +360,20 @@ class SharePointClient:
         
         drive_path = f"https://graph.microsoft.com/v1.0/sites/{self.cfg.SP_SITE_ID}/drive/root:{image_source_url}:/content"
         try:
-            response = self._get_with_retry(drive_path)
-            if response.status_code == 200:
-                return response.content
+            response = self._get_with_retry(drive_path, stream=True)
+            with response:
+                if response.status_code != 200:
+                    return None
+                content_length = response.headers.get("Content-Length")
+                if content_length and int(content_length) < self.MIN_IMAGE_BYTES:
+                    logger.info(f"Skipping {image_source_url}: {content_length} bytes, too small for a diagram")
+                    return None
+                body = response.iter_content(chunk_size=self.IMAGE_HEAD_BYTES)
+                head = next(body, b"")
+                if not head.startswith(_IMAGE_SIGNATURES):
+                    logger.info(f"Skipping {image_source_url}: not a raster image")
+                    return None
+                return head + b"".join(body)
         except Exception as e:
             logger.error(f"Failed to download image {image_source_url}: {e}")
         return None
@@ -49,10 +49,36 @@ class Config:
         self.SP_LIST_ID = os.getenv("SP_LIST_ID")
         self.SP_HADR_LIST_ID = os.getenv("SP_HADR_LIST_ID")
         self.SP_PAGES_LIBRARY = os.getenv("SP_PAGES_LIBRARY", "SitePages")
-        
+
+        # Ingestion concurrency (per stage)
+        # Fetch is network-bound and benefits from many requests in flight;
+        # transform is bounded by local CPU. Unset values fall back to
+        # CPU-derived defaults chosen by the pipeline.
+        self.FETCH_CONCURRENCY = self._optional_int("FETCH_CONCURRENCY")
+        self.TRANSFORM_CONCURRENCY = self._optional_int("TRANSFORM_CONCURRENCY")
+        # Services the HA/DR pipeline processes at once (pipeline default if unset)
+        self.SERVICE_HADR_CONCURRENCY = self._optional_int("SERVICE_HADR_CONCURRENCY")
+
+        # Resume support (optional): directory holding the completed-pattern log
+        self.INGEST_CHECKPOINT_DIR = os.getenv("INGEST_CHECKPOINT_DIR")
+
         # Validate configuration
         self._validate()
     
+    @staticmethod
+    def _optional_int(var):
+        """Read a positive integer environment variable, or None if unset"""
+        raw = os.getenv(var)
+        if not raw:
+            return None
+        try:
+            value = int(raw)
+        except ValueError:
+            raise ConfigurationError(f"{var} must be an integer, got '{raw}'")
+        if value < 1:
+            raise ConfigurationError(f"{var} must be >= 1, got {value}")
+        return value
+
     def _validate(self):
         """Validate that all required environment variables are set"""
         missing = []
@@ -0,0 +1,33 @@
+"""
+Import Outcome Helpers
+----------------------
+Shared by the pipelines that index through Discovery Engine's ImportDocuments.
+
+A successful ImportDocuments operation can still reject individual documents.
+The operation metadata counts them (`failure_count`) and the response carries
+a sample of their errors (`error_samples`), whose messages name the rejected
+document. Pipelines record a document as indexed (checkpoint, fingerprint)
+only once it is known not to be among the rejected ones.
+"""
+
+import re
+from typing import Iterable, Optional, Set
+
+
+def failed_document_ids(document_ids: Iterable[str], response, metadata) -> Optional[Set[str]]:
+    """
+    IDs among *document_ids* that an ImportDocuments operation rejected.
+
+    Returns an empty set when nothing failed, and None when more documents
+    failed than the error samples name: the rejected documents are then
+    unknown, and the caller decides how to treat the batch.
+    """
+    samples = [status.message for status in getattr(response, "error_samples", None) or []]
+    failure_count = max(getattr(metadata, "failure_count", 0) or 0, len(samples))
+    if not failure_count:
+        return set()
+    failed = {
+        document_id for document_id in document_ids
+        if any(re.search(rf"(?<![\w-]){re.escape(document_id)}(?![\w-])", message) for message in samples)
+    }
+    return failed if len(failed) >= failure_count else None
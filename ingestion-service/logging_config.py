@@ -0,0 +1,42 @@
+"""
+Logging Setup
+-------------
+Shared logging configuration for the ingestion pipeline entry points.
+
+SYSTEM DESIGN NOTE: Queue-Based Logging
+---------------------------------------
+Pipelines process many patterns concurrently and each one logs several lines.
+With a plain StreamHandler every record is a write() to stderr under the
+handler lock, taken by whichever worker thread logged it. Instead, the root
+logger gets a QueueHandler: workers only append the record to an in-memory
+queue, and a single QueueListener thread formats and writes them. Output order
+and format are unchanged.
+"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(level: int = logging.INFO) -> QueueListener:
+    """
+    Routes root logging through a background QueueListener.
+
+    The listener is stopped (and the queue drained) at interpreter exit.
+    """
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [QueueHandler(log_queue)]
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
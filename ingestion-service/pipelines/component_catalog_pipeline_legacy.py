@@ -1,21 +1,253 @@
 import os
+import re
+import base64
+import hashlib
+import itertools
 import json
 import logging
-import base64
+import random
+import sys
+import tempfile
+import threading
+import time
 import hcl2
 import yaml
 import boto3
-from typing import List, Dict, Any, Optional
-from github import Github
+import orjson
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
+from github import Github, GithubRetry, RateLimitExceededException
 from github.Repository import Repository
-from github.ContentFile import ContentFile
+from github.GitTreeElement import GitTreeElement
 from google.cloud import discoveryengine_v1 as discoveryengine
+from google.cloud import storage
+from google.cloud.storage import transfer_manager
 from google.api_core.client_options import ClientOptions
 
+# Shared ingestion helpers live in the service root, which is not on sys.path
+# when a pipeline is run as a script.
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICE_ROOT not in sys.path:
+    sys.path.append(_SERVICE_ROOT)
+
+from indexing import failed_document_ids  # noqa: E402
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# GitHub GraphQL limits the number of nodes per query; blob texts are fetched
+# in batches of this many aliased `object(oid:)` lookups.
+GRAPHQL_BLOB_BATCH_SIZE = 100
+
+# GitHub fetches are network-bound; a small bounded pool overlaps their latency
+# while staying well below GitHub's secondary (abuse) rate limits.
+GITHUB_FETCH_WORKERS = 6
+GITHUB_MAX_RETRIES = 4
+# Largest file the REST Contents API returns inline.
+CONTENTS_API_MAX_BYTES = 1024 * 1024
+
+# ImportDocuments accepts at most this many documents inline; larger catalogs
+# are staged to GCS as NDJSON and imported with a GcsSource.
+INLINE_IMPORT_MAX_DOCS = 100
+# Batch size for GCS-staged imports (see CATALOG_STAGING_BUCKET).
+GCS_IMPORT_BATCH_DOCS = 1000
+# Staged NDJSON files larger than one part are uploaded as an XML multipart
+# upload with this many parts in flight, instead of one sequential stream.
+STAGING_UPLOAD_PART_BYTES = 8 * 1024 * 1024
+STAGING_UPLOAD_WORKERS = 8
+
+# Parsed schemas are cached per blob SHA under this directory; the version is
+# bumped whenever parsing output changes, so stale schemas are never reused.
+SCHEMA_CACHE_DIRNAME = "schemas-v3"
+
+# The full schema lives only in Document.Content; struct_data carries a short preview.
+SCHEMA_PREVIEW_BYTES = 512
+
+# Concurrent Service Catalog product lookups (list artifacts + describe parameters).
+SC_DESCRIBE_WORKERS = 10
+# search_products returns at most 20 products per page.
+SC_SEARCH_PAGE_SIZE = 20
+
+# CloudFormation templates can run to thousands of lines; the libyaml-backed
+# loader parses them several times faster than the pure-Python SafeLoader.
+if not yaml.__with_libyaml__:
+    logger.warning("PyYAML was built without libyaml; CFN parsing will use the slow pure-Python loader.")
+
+
+class _CfnLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    """Safe YAML loader that tolerates CloudFormation intrinsic tags (!Ref, !Sub, ...)."""
+
+
+def _construct_cfn_intrinsic(loader, tag_suffix, node):
+    # Only the Parameters block is read, so intrinsics are kept unresolved as
+    # their long-form dict ({"Ref": ...}, {"Fn::Sub": ...}).
+    name = tag_suffix if tag_suffix == "Ref" else f"Fn::{tag_suffix}"
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    else:
+        value = loader.construct_mapping(node, deep=True)
+    return {name: value}
+
+
+_CfnLoader.add_multi_constructor("!", _construct_cfn_intrinsic)
+
+
+# variables.tf files only need `variable "x" { type/description/default }`, which a
+# targeted scanner extracts far faster than building a full Lark parse with hcl2.
+# Anything it cannot handle exactly (heredocs, multi-line or HCL-syntax values)
+# raises ValueError and the caller falls back to hcl2.
+_TF_VARIABLE_RE = re.compile(r'variable\s+"([^"]+)"\s*\{')
+_TF_ATTRIBUTE_RE = re.compile(r'^[ \t]*(type|description|default)[ \t]*=[ \t]*(.*?)[ \t]*$', re.MULTILINE)
+_TF_LITERALS = {"true": True, "false": False, "null": None}
+
+
+def _tf_block_end(content: str, start: int) -> int:
+    """Returns the index just past the brace closing the block opened before *start*."""
+    depth = 1
+    in_string = False
+    i = start
+    while i < len(content):
+        ch = content[i]
+        if in_string:
+            if ch == "\\":
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "#" or content.startswith("//", i):
+            i = content.find("\n", i)
+            if i == -1:
+                break
+        elif content.startswith("/*", i):
+            i = content.find("*/", i)
+            if i == -1:
+                break
+            i += 1
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("unbalanced braces")
+
+
+def _tf_strip_comment(raw: str) -> str:
+    """Drops a trailing `#` or `//` comment from a single-line attribute value."""
+    in_string = False
+    i = 0
+    while i < len(raw):
+        ch = raw[i]
+        if in_string:
+            if ch == "\\":
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "#" or raw.startswith("//", i):
+            return raw[:i].rstrip()
+        elif raw.startswith("/*", i):
+            raise ValueError(f"inline block comment: {raw}")
+        i += 1
+    return raw
+
+
+def _tf_type_expression(var_type: Any) -> str:
+    """Type expression as written (e.g. list(string)), without hcl2's ${...} wrapper."""
+    var_type = str(var_type)
+    if var_type.startswith("${") and var_type.endswith("}"):
+        return var_type[2:-1]
+    return var_type
+
+
+def _tf_literal(raw: str) -> Any:
+    """Converts a single-line HCL literal (JSON-compatible subset) to a Python value."""
+    if raw in _TF_LITERALS:
+        return _TF_LITERALS[raw]
+    if "${" in raw or raw.startswith("<<"):
+        raise ValueError(f"unsupported expression: {raw}")
+    return json.loads(raw)
+
+
+def _scan_terraform_variables(content_str: str) -> Dict[str, Dict[str, Any]]:
+    """Extracts variable definitions from variables.tf without a full HCL parse."""
+    variables = {}
+    for match in _TF_VARIABLE_RE.finditer(content_str):
+        body = content_str[match.end():_tf_block_end(content_str, match.end()) - 1]
+        attrs = {}
+        if "/*" in body:
+            # An attribute-like line inside a block comment is not an attribute.
+            raise ValueError(f"block comment in {match.group(1)}")
+        for key, value in _TF_ATTRIBUTE_RE.findall(body):
+            # First occurrence is the block's own attribute, not a nested one.
+            attrs.setdefault(key, _tf_strip_comment(value))
+
+        var_type = attrs.get("type", "any")
+        if var_type.count("(") != var_type.count(")") or var_type.count("{") != var_type.count("}"):
+            raise ValueError(f"multi-line type for {match.group(1)}")
+
+        variables[match.group(1)] = {
+            "type": var_type,
+            "description": _tf_literal(attrs["description"]) if "description" in attrs else "No description",
+            "default": _tf_literal(attrs["default"]) if "default" in attrs else "<<REQUIRED>>",
+        }
+    return variables
+
+# python-hcl2 (pinned in requirements.txt) is told to emit plain values: unquoted
+# names and strings, heredocs as regular strings, no comment/block markers. With
+# _tf_type_expression this gives the fast scanner's output shape.
+_HCL2_OPTIONS = hcl2.SerializationOptions(
+    with_comments=False,
+    explicit_blocks=False,
+    preserve_heredocs=False,
+    strip_string_quotes=True,
+)
+
+
+def _parse_terraform_variables_hcl2(content_str: str) -> Dict[str, Dict[str, Any]]:
+    """Full HCL parse of variables.tf, for files the fast scanner cannot handle."""
+    parsed = hcl2.loads(content_str, serialization_options=_HCL2_OPTIONS)
+
+    variables = {}
+    for entry in parsed.get("variable", []):
+        for name, config in entry.items():
+            variables[name] = {
+                "type": _tf_type_expression(config.get("type", "any")),
+                "description": config.get("description", "No description"),
+                "default": config.get("default", "<<REQUIRED>>"),
+            }
+    return variables
+
+# Repository layout: Terraform modules under 'modules/', CFN products under 'service-catalog/'.
+_TF_MODULES_PREFIX = "modules/"
+_TF_VARIABLES_SUFFIX = "/variables.tf"
+_CFN_TEMPLATES_PREFIX = "service-catalog/"
+_CFN_TEMPLATE_SUFFIXES = (".yaml", ".yml", ".json")
+
+
+def _is_module_variables_file(path: str) -> bool:
+    return path.startswith(_TF_MODULES_PREFIX) and path.endswith(_TF_VARIABLES_SUFFIX)
+
+
+def _is_cfn_template(path: str) -> bool:
+    return path.startswith(_CFN_TEMPLATES_PREFIX) and path.endswith(_CFN_TEMPLATE_SUFFIXES)
+
+
+def _document_fingerprint(doc: discoveryengine.Document) -> str:
+    """BLAKE2b digest of a document's content and struct_data (fast, C-accelerated)."""
+    digest = hashlib.blake2b(doc.content.raw_bytes, digest_size=16)
+    digest.update(repr(sorted(dict(doc.struct_data).items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
 class ComponentCatalogPipeline:
     """
     Ingests infrastructure component definitions (Terraform Modules & CloudFormation Templates)
@@ -28,13 +260,48 @@ class ComponentCatalogPipeline:
         self.data_store_id = os.getenv("VERTEX_SEARCH_CATALOG_STORE_ID", "component-catalog-ds")
         
         # GitHub Config
-        self.github_token = os.getenv("GITHUB_TOKEN")
+        # GITHUB_TOKENS (comma-separated) spreads requests across several tokens,
+        # each with its own 5000 req/hr quota; GITHUB_TOKEN alone is a pool of one.
+        self.github_tokens = [
+            token.strip() for token in os.getenv("GITHUB_TOKENS", "").split(",") if token.strip()
+        ] or [token for token in [os.getenv("GITHUB_TOKEN")] if token]
+        self.github_token = self.github_tokens[0] if self.github_tokens else None
         self.repo_name = os.getenv("GITHUB_INFRA_REPO", "rnerurkar/engen-infrastructure")
+        self.graphql_url = os.getenv("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+
+        # Local cache of file contents keyed by git blob SHA (content-addressed,
+        # so entries never go stale). Unchanged files are not re-downloaded.
+        self.cache_dir = os.getenv(
+            "CATALOG_CACHE_DIR", os.path.join(tempfile.gettempdir(), "engen-catalog-cache")
+        )
+        os.makedirs(os.path.join(self.cache_dir, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(self.cache_dir, SCHEMA_CACHE_DIRNAME), exist_ok=True)
+
+        # Run state and import fingerprints describe what one data store already
+        # holds, so they live in a directory of their own per project/location/store;
+        # a fresh or different store starts from empty state and is imported in full.
+        self.state_dir = os.path.join(
+            self.cache_dir, "stores", self.project_id, self.location, self.data_store_id
+        )
+        os.makedirs(self.state_dir, exist_ok=True)
+
+        # Fingerprints of the documents last imported; unchanged documents are not re-sent.
+        self._fingerprints_path = os.path.join(self.state_dir, "fingerprints.json")
+        self._fingerprints = self._load_fingerprints()
+        self._fingerprints_lock = threading.Lock()
         
         if not self.github_token:
-            raise ValueError("GITHUB_TOKEN environment variable is required.")
+            raise ValueError("GITHUB_TOKEN (or GITHUB_TOKENS) environment variable is required.")
 
-        self.gh = Github(self.github_token)
+        # 100 items per page (the API maximum, default 30) cuts paginated listing
+        # requests ~3x; GithubRetry backs off on rate-limit 403s and 5xx, and the
+        # timeout caps hung connections.
+        self.gh_pool = [
+            Github(token, per_page=100, timeout=30, retry=GithubRetry(total=5, backoff_factor=1.0))
+            for token in self.github_tokens
+        ]
+        self.gh = self.gh_pool[0]
+        self._token_counter = itertools.count()
         
         # Vertex AI Search Client
         client_options = (
@@ -43,13 +310,23 @@ class ComponentCatalogPipeline:
             else None
         )
         self.client = discoveryengine.DocumentServiceClient(client_options=client_options)
+
+        # Optional GCS bucket for staging bulk imports
+        self.staging_bucket = os.getenv("CATALOG_STAGING_BUCKET")
+        self.storage_client = storage.Client(project=self.project_id) if self.staging_bucket else None
         
+        # Service Catalog products come from the AWS API by default; set
+        # AWS_SERVICE_CATALOG_ENABLED=false to parse the CFN templates under
+        # 'service-catalog/' in the repository instead.
+        self.use_aws_api = os.getenv("AWS_SERVICE_CATALOG_ENABLED", "true").lower() not in ("false", "0", "no")
+
         # AWS Service Catalog Client
-        try:
-            self.sc_client = boto3.client('servicecatalog')
-        except Exception as e:
-            logger.warning(f"Failed to initialize AWS Service Catalog client: {e}")
-            self.sc_client = None
+        self.sc_client = None
+        if self.use_aws_api:
+            try:
+                self.sc_client = boto3.client('servicecatalog')
+            except Exception as e:
+                logger.warning(f"Failed to initialize AWS Service Catalog client: {e}")
 
 
     def run(self):
@@ -57,201 +334,446 @@ class ComponentCatalogPipeline:
         logger.info(f"Starting Component Catalog Ingestion for repo: {self.repo_name}")
         
         try:
-            repo = self.gh.get_repo(self.repo_name)
-            documents = []
-
-            # 1. Process Terraform Modules
-            tf_docs = self._process_terraform_modules(repo)
-            documents.extend(tf_docs)
-            logger.info(f"Extracted {len(tf_docs)} Terraform module schemas.")
-
-            # 2. Process Service Catalog/CloudFormation Products (via AWS API)
-            sc_docs = self._process_aws_service_catalog()
-            documents.extend(sc_docs)
-            logger.info(f"Extracted {len(sc_docs)} AWS Service Catalog product schemas.")
-            
-            # (Note: Original CFN git scanning removed in favor of direct SC query)
+            # The GitHub and Service Catalog stages share no state, so they run
+            # concurrently. Each stage yields documents that are imported in batches
+            # as they are produced: wall time is roughly the slowest stage, not the
+            # sum, and memory is bounded by one batch per stage.
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                # future -> (label, expected document count for repository stages)
+                stages = {}
+                if self.use_aws_api:
+                    # AWS API calls don't need the repository, so start them first.
+                    stages[executor.submit(self._index_stream, self._process_aws_service_catalog())] = ("AWS Service Catalog product", None)
 
-            # 3. Index to Vertex AI Search
-            if documents:
-                self._index_documents(documents)
-            else:
+                repo = self.gh.get_repo(self.repo_name)
+
+                # Snapshot the repository file list in a single Git Trees API call,
+                # pinned to the head commit so later content reads are consistent.
+                ref = repo.get_branch(repo.default_branch).commit.sha
+                run_state = {"repo_sha": ref, "use_aws_api": self.use_aws_api}
+                repo_unchanged = self._load_run_state() == run_state
+                tree_complete = True
+                if repo_unchanged:
+                    logger.info(f"Repository unchanged since last run (commit {ref[:12]}); skipping repository scan.")
+                else:
+                    blobs, tree_complete = self._list_repo_blobs(repo, ref)
+
+                    # 1. Process Terraform Modules
+                    tf_files = [b for b in blobs if _is_module_variables_file(b.path)]
+                    stages[executor.submit(self._index_stream, self._process_terraform_modules(repo, ref, tf_files))] = ("Terraform module", len(tf_files))
+
+                    # 2. Process Service Catalog/CloudFormation Products (from the repo when the AWS API is off)
+                    if not self.use_aws_api:
+                        cfn_files = [b for b in blobs if _is_cfn_template(b.path)]
+                        stages[executor.submit(self._index_stream, self._process_cloudformation_templates(repo, ref, cfn_files))] = ("CloudFormation template", len(cfn_files))
+
+                # 3. Index to Vertex AI Search
+                indexed = 0
+                repo_complete = not repo_unchanged and tree_complete
+                for future in as_completed(stages):
+                    count = future.result()
+                    label, expected = stages[future]
+                    logger.info(f"Processed {count} {label} schemas.")
+                    if expected is not None and count != expected:
+                        repo_complete = False
+                    indexed += count
+
+            # Only remember the commit once every repository file was indexed, so a
+            # partially failed run (or one that saw a truncated tree listing) is
+            # retried in full next time.
+            if repo_complete:
+                self._save_run_state(run_state)
+
+            if not indexed and not repo_unchanged:
                 logger.warning("No documents found to index.")
 
         except Exception as e:
             logger.error(f"Pipeline failed: {e}", exc_info=True)
 
-    def _process_terraform_modules(self, repo: Repository) -> List[discoveryengine.Document]:
-        """Scans 'modules/' directory for variables.tf and creates schemas."""
-        docs = []
+    def _load_run_state(self) -> Dict[str, Any]:
+        """Reads the state recorded by the last successful run (empty if none)."""
         try:
-            # Assuming modules are in a root 'modules' folder
-            contents = repo.get_contents("modules")
-            while contents:
-                file_content = contents.pop(0)
-                if file_content.type == "dir":
-                    contents.extend(repo.get_contents(file_content.path))
-                elif file_content.name == "variables.tf":
-                    # We found a module definition
-                    module_path = os.path.dirname(file_content.path)
-                    module_name = os.path.basename(module_path)
-                    
-                    schema = self._parse_terraform_variables(file_content)
-                    if schema:
-                        doc = self._create_vertex_document(
-                            id=f"tf-{module_name}",
-                            title=f"Terraform Module: {module_name}",
-                            category="Terraform Module",
-                            content=json.dumps(schema, indent=2),
-                            uri=file_content.html_url
-                        )
-                        docs.append(doc)
+            with open(os.path.join(self.state_dir, "run_state.json"), "rb") as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_run_state(self, state: Dict[str, Any]):
+        path = os.path.join(self.state_dir, "run_state.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(state))
+        os.replace(tmp_path, path)
+
+    def _list_repo_blobs(self, repo: Repository, ref: str) -> Tuple[List[GitTreeElement], bool]:
+        """
+        Lists every file in the repository at *ref* with one recursive Git Trees call.
+
+        This replaces a breadth-first walk that issued one Contents API request per
+        directory, which was slow and burned the 5000 req/hr rate limit on large repos.
+        Returns the blobs and whether the listing is complete; GitHub truncates very
+        large trees, in which case the run must not be recorded as done.
+        """
+        tree = repo.get_git_tree(sha=ref, recursive=True)
+        complete = not tree.raw_data.get("truncated")
+        if not complete:
+            logger.error(
+                "GitHub truncated the recursive tree listing; files past the cut-off are "
+                "skipped and the repository will be rescanned on the next run."
+            )
+        return [element for element in tree.tree if element.type == "blob"], complete
+
+    def _fetch_blob_texts(self, repo: Repository, ref: str, blobs: List[GitTreeElement]) -> Dict[str, str]:
+        """
+        Fetches the text of many blobs with batched GraphQL queries.
+
+        Each query carries one aliased `object(oid:)` lookup per blob, so N files cost
+        N / GRAPHQL_BLOB_BATCH_SIZE requests instead of N REST Contents calls.
+        Blobs GraphQL will not inline (binary or truncated) fall back to REST.
+        Blobs whose SHA is already in the local cache are not fetched at all.
+        Returns a {path: text} mapping.
+
+        Failures are isolated: a failed GraphQL batch falls back to REST for its
+        blobs, and a blob that cannot be read over REST (e.g. not UTF-8) is logged
+        and left out of the result and the cache, so callers skip only that path.
+        """
+        texts: Dict[str, str] = {}
+        missing: List[GitTreeElement] = []
+        for blob in blobs:
+            cached = self._read_cached_blob(blob.sha)
+            if cached is None:
+                missing.append(blob)
+            else:
+                texts[blob.path] = cached
+        logger.info(f"Blob cache: {len(texts)} hits, {len(missing)} to fetch.")
+
+        batches = [
+            missing[start:start + GRAPHQL_BLOB_BATCH_SIZE]
+            for start in range(0, len(missing), GRAPHQL_BLOB_BATCH_SIZE)
+        ]
+        fetched: Dict[str, str] = {}
+        fallback: List[GitTreeElement] = []
+
+        # Batches (and REST fallbacks) are independent, so they run on a bounded pool.
+        with ThreadPoolExecutor(max_workers=GITHUB_FETCH_WORKERS) as executor:
+            batch_futures = [
+                (batch, executor.submit(self._query_blob_batch, repo, batch)) for batch in batches
+            ]
+            for batch, future in batch_futures:
+                try:
+                    batch_texts, batch_fallback = future.result()
+                except Exception as e:
+                    logger.warning(f"GraphQL batch of {len(batch)} blobs failed ({e}); fetching them via REST.")
+                    batch_texts, batch_fallback = {}, batch
+                fetched.update(batch_texts)
+                fallback.extend(batch_fallback)
+
+            for blob in fallback:
+                logger.info(f"GraphQL did not inline {blob.path}; fetching via REST.")
+            rest_futures = [
+                (blob, executor.submit(self._with_backoff, lambda blob=blob: self._fetch_blob_via_rest(repo, ref, blob)))
+                for blob in fallback
+            ]
+            for blob, future in rest_futures:
+                try:
+                    fetched[blob.path] = future.result()
+                except Exception as e:
+                    logger.warning(f"Skipping {blob.path}: could not read blob ({e})")
+
+        for blob in missing:
+            if blob.path in fetched:
+                self._write_cached_blob(blob.sha, fetched[blob.path])
+        texts.update(fetched)
+        return texts
+
+    def _fetch_blob_via_rest(self, repo: Repository, ref: str, blob: GitTreeElement) -> str:
+        """
+        Reads one blob over REST.
+
+        The Contents API only inlines files up to 1 MB; above that its `content` is
+        empty and `decoded_content` cannot decode it, so larger blobs are read by SHA
+        through the Git Blobs API (up to 100 MB).
+        """
+        if len(self.gh_pool) > 1:
+            repo = self.gh_pool[self._next_token_index()].get_repo(repo.full_name, lazy=True)
+        if blob.size is not None and blob.size <= CONTENTS_API_MAX_BYTES:
+            return repo.get_contents(blob.path, ref=ref).decoded_content.decode("utf-8")
+        git_blob = repo.get_git_blob(blob.sha)
+        return base64.b64decode(git_blob.content).decode("utf-8")
+
+    def _blob_cache_path(self, sha: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", sha)
+
+    def _read_cached_blob(self, sha: str) -> Optional[str]:
+        try:
+            with open(self._blob_cache_path(sha), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_cached_blob(self, sha: str, text: str):
+        # Write-then-rename so a crash never leaves a partial entry under a valid SHA.
+        path = self._blob_cache_path(sha)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _cached_schema(self, blob: GitTreeElement, content_str: str, parse) -> Optional[Dict[str, Any]]:
+        """
+        Returns the parsed schema for *blob*, parsing only on a cache miss.
+
+        HCL parsing in particular is slow (hundreds of ms per file). Parse results are
+        keyed by blob SHA; "source" is re-stamped since identical files can live at
+        several paths. Parse failures are not cached.
+        """
+        path = os.path.join(self.cache_dir, SCHEMA_CACHE_DIRNAME, f"{blob.sha}.json")
+        try:
+            with open(path, "rb") as f:
+                schema = orjson.loads(f.read())
+            schema["source"] = blob.path
+            return schema
+        except FileNotFoundError:
+            pass
+
+        schema = parse(blob.path, content_str)
+        if schema:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(schema, default=str, option=orjson.OPT_NON_STR_KEYS))
+            os.replace(tmp_path, path)
+        return schema
+
+    def _query_blob_batch(self, repo: Repository, batch: List[GitTreeElement]):
+        """Runs one GraphQL query for *batch*; returns ({path: text}, [blobs needing REST])."""
+        owner, name = repo.full_name.split("/", 1)
+        fields = "\n".join(
+            f'b{i}: object(oid: "{blob.sha}") {{ ... on Blob {{ text isTruncated }} }}'
+            for i, blob in enumerate(batch)
+        )
+        query = f'query {{ repository(owner: "{owner}", name: "{name}") {{ {fields} }} }}'
+        results = self._with_backoff(lambda: self._post_graphql(query))["repository"]
+
+        texts: Dict[str, str] = {}
+        fallback: List[GitTreeElement] = []
+        for i, blob in enumerate(batch):
+            node = results.get(f"b{i}") or {}
+            if node.get("text") is not None and not node.get("isTruncated"):
+                texts[blob.path] = node["text"]
+            else:
+                fallback.append(blob)
+        return texts, fallback
+
+    def _post_graphql(self, query: str) -> Dict[str, Any]:
+        """POSTs a GraphQL query and returns its `data` payload."""
+        response = requests.post(
+            self.graphql_url,
+            json={"query": query},
+            headers={"Authorization": f"bearer {self.github_tokens[self._next_token_index()]}"},
+            timeout=60,
+        )
+        if response.status_code in (403, 429):
+            raise RateLimitExceededException(response.status_code, response.text, dict(response.headers))
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("errors"):
+            raise RuntimeError(f"GitHub GraphQL query failed: {payload['errors']}")
+        return payload["data"]
+
+    def _next_token_index(self) -> int:
+        """Round-robin index into the token pool (safe across worker threads)."""
+        return next(self._token_counter) % len(self.github_tokens)
+
+    def _with_backoff(self, call):
+        """
+        Retries *call* when GitHub rate limits us.
+
+        Each attempt picks the next pooled token, so a throttled token is rotated out
+        immediately; the exponential backoff only applies once every token has been tried.
+        """
+        pool_size = len(self.github_tokens)
+        attempts = GITHUB_MAX_RETRIES * pool_size
+        for attempt in range(attempts):
+            try:
+                return call()
+            except RateLimitExceededException:
+                if attempt == attempts - 1:
+                    raise
+                if (attempt + 1) % pool_size:
+                    logger.info("GitHub rate limit hit; rotating to the next token")
+                    continue
+                # Jittered so parallel fetch workers do not all retry at once.
+                delay = 2 ** (attempt // pool_size) * random.uniform(0.5, 1.5)
+                logger.warning(f"GitHub rate limit hit; retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _process_terraform_modules(
+        self, repo: Repository, ref: str, tf_files: List[GitTreeElement]
+    ) -> Iterator[discoveryengine.Document]:
+        """Yields schema documents for the 'modules/**/variables.tf' files found in the tree."""
+        try:
+            texts = self._fetch_blob_texts(repo, ref, tf_files)
+            for blob in tf_files:
+                # We found a module definition
+                path = blob.path
+                if path not in texts:
+                    continue
+                module_path = os.path.dirname(path)
+                module_name = os.path.basename(module_path)
+                
+                schema = self._cached_schema(blob, texts[path], self._parse_terraform_variables)
+                if schema:
+                    doc = self._create_vertex_document(
+                        id=f"tf-{module_name}",
+                        title=f"Terraform Module: {module_name}",
+                        category="Terraform Module",
+                        schema=schema,
+                        uri=f"{repo.html_url}/blob/{repo.default_branch}/{path}"
+                    )
+                    yield doc
         except Exception as e:
             logger.warning(f"Error processing Terraform modules: {e}")
-        return docs
 
-    def _process_aws_service_catalog(self) -> List[discoveryengine.Document]:
+    def _process_aws_service_catalog(self) -> Iterator[discoveryengine.Document]:
         """Fetch products from AWS Service Catalog API."""
-        docs = []
         if not self.sc_client:
             logger.info("Skipping Service Catalog sync (no boto3 client).")
-            return docs
+            return
             
         try:
             logger.info("Scanning AWS Service Catalog...")
             paginator = self.sc_client.get_paginator('search_products')
-            for page in paginator.paginate():
-                for product_view in page.get('ProductViewSummaries', []):
-                    product_id = product_view['ProductId']
-                    product_name = product_view['Name']
-                    
-                    # Get Versions (Finding the Latest)
-                    try:
-                        versions = self.sc_client.list_provisioning_artifacts(ProductId=product_id)
-                        artifacts = sorted(
-                            versions.get('ProvisioningArtifactDetails', []),
-                            key=lambda x: x['CreatedTime'],
-                            reverse=True
-                        )
-                        
-                        if not artifacts:
-                            continue
-                            
-                        # Latest Artifact
-                        latest = artifacts[0]
-                        artifact_id = latest['Id']
-                        artifact_name = latest['Name']
-                        
-                        # Get Parameters
-                        params_resp = self.sc_client.describe_provisioning_parameters(
-                            ProductId=product_id,
-                            ProvisioningArtifactId=artifact_id
-                        )
-                        
-                        parameters = {}
-                        for p in params_resp.get('ProvisioningArtifactParameters', []):
-                            parameters[p['ParameterKey']] = {
-                                "type": p.get('ParameterType', 'String'),
-                                "description": p.get('Description', ''),
-                                "default": p.get('ParameterDefaultValue', "<<REQUIRED>>"),
-                                "constraints": p.get('ParameterConstraints', {}),
-                                "is_no_echo": p.get('IsNoEcho', False)
-                            }
-                        
-                        # Create Schema Definition
-                        schema = {
-                            "type": "service_catalog_product",
-                            "attributes": {
-                                "service_catalog_product_id": product_id,
-                                "service_catalog_product_name": product_name,
-                                "provisioning_artifact_id": artifact_id,
-                                "provisioning_artifact_name": artifact_name,
-                                "parameters": parameters
-                            }
-                        }
-                        
-                        doc = self._create_vertex_document(
-                            id=f"sc-{product_id}",
-                            title=f"Service Catalog Product: {product_name} ({artifact_name})",
-                            category="Service Catalog Product",
-                            content=json.dumps(schema, indent=2),
-                            uri=f"arn:aws:servicecatalog:::product/{product_id}"
-                        )
-                        docs.append(doc)
-                        logger.info(f"Indexed SC Product: {product_name}")
-                        
-                    except Exception as inner_e:
-                        logger.warning(f"Failed to process product {product_name}: {inner_e}")
-                        continue
+
+            # Per-product lookups are independent, latency-bound calls; fan them out
+            # over one shared (thread-safe) boto3 client. Products are submitted as
+            # each page arrives, so workers describe page N while page N+1 is fetched.
+            with ThreadPoolExecutor(max_workers=SC_DESCRIBE_WORKERS) as executor:
+                futures = []
+                for page in paginator.paginate(PaginationConfig={'PageSize': SC_SEARCH_PAGE_SIZE}):
+                    for product_view in page.get('ProductViewSummaries', []):
+                        futures.append(executor.submit(
+                            self._build_service_catalog_document,
+                            product_view['ProductId'],
+                            product_view['Name']
+                        ))
+                for future in as_completed(futures):
+                    doc = future.result()
+                    if doc:
+                        yield doc
                         
         except Exception as e:
             logger.error(f"Error querying AWS Service Catalog: {e}")
-            
-        return docs
 
-    def _parse_terraform_variables(self, content_file: ContentFile) -> Optional[Dict[str, Any]]:
-        """Parses variables.tf content using python-hcl2."""
+    def _build_service_catalog_document(self, product_id: str, product_name: str) -> Optional[discoveryengine.Document]:
+        """Describes the latest artifact of one SC product and builds its document."""
+        # Get Versions (Finding the Latest)
         try:
-            content_str = base64.b64decode(content_file.content).decode("utf-8")
-            parsed = hcl2.loads(content_str)
+            versions = self.sc_client.list_provisioning_artifacts(ProductId=product_id)
+            artifacts = sorted(
+                versions.get('ProvisioningArtifactDetails', []),
+                key=lambda x: x['CreatedTime'],
+                reverse=True
+            )
+            
+            if not artifacts:
+                return None
+                
+            # Latest Artifact
+            latest = artifacts[0]
+            artifact_id = latest['Id']
+            artifact_name = latest['Name']
             
-            variables = {}
-            for entry in parsed.get("variable", []):
-                for name, config in entry.items():
-                    # Extract type, description, default
-                    var_type = config.get("type", "any")
-                    desc = config.get("description", "No description")
-                    default = config.get("default", "<<REQUIRED>>")
-                    
-                    variables[name] = {
-                        "type": str(var_type),
-                        "description": desc,
-                        "default": default
-                    }
-                    
+            # Get Parameters
+            params_resp = self.sc_client.describe_provisioning_parameters(
+                ProductId=product_id,
+                ProvisioningArtifactId=artifact_id
+            )
+            
+            parameters = {}
+            for p in params_resp.get('ProvisioningArtifactParameters', []):
+                parameters[p['ParameterKey']] = {
+                    "type": p.get('ParameterType', 'String'),
+                    "description": p.get('Description', ''),
+                    "default": p.get('ParameterDefaultValue', "<<REQUIRED>>"),
+                    "constraints": p.get('ParameterConstraints', {}),
+                    "is_no_echo": p.get('IsNoEcho', False)
+                }
+            
+            # Create Schema Definition
+            schema = {
+                "type": "service_catalog_product",
+                "attributes": {
+                    "service_catalog_product_id": product_id,
+                    "service_catalog_product_name": product_name,
+                    "provisioning_artifact_id": artifact_id,
+                    "provisioning_artifact_name": artifact_name,
+                    "parameters": parameters
+                }
+            }
+            
+            doc = self._create_vertex_document(
+                id=f"sc-{product_id}",
+                title=f"Service Catalog Product: {product_name} ({artifact_name})",
+                category="Service Catalog Product",
+                schema=schema,
+                uri=f"arn:aws:servicecatalog:::product/{product_id}"
+            )
+            logger.info(f"Indexed SC Product: {product_name}")
+            return doc
+            
+        except Exception as inner_e:
+            logger.warning(f"Failed to process product {product_name}: {inner_e}")
+            return None
+
+    def _parse_terraform_variables(self, path: str, content_str: str) -> Optional[Dict[str, Any]]:
+        """Parses variables.tf content, using python-hcl2 only when the fast scanner can't."""
+        try:
+            try:
+                variables = _scan_terraform_variables(content_str)
+            except ValueError as scan_error:
+                logger.debug(f"Falling back to hcl2 for {path}: {scan_error}")
+                variables = _parse_terraform_variables_hcl2(content_str)
+
             return {
                 "type": "terraform_module",
-                "source": content_file.path,
+                "source": path,
                 "attributes": variables
             }
         except Exception as e:
-            logger.error(f"Failed to parse HCL for {content_file.path}: {e}")
+            logger.error(f"Failed to parse HCL for {path}: {e}")
             return None
 
-    def _process_cloudformation_templates(self, repo: Repository) -> List[discoveryengine.Document]:
-        """Scans 'service-catalog/' directory for templates and creates schemas."""
-        docs = []
+    def _process_cloudformation_templates(
+        self, repo: Repository, ref: str, cfn_files: List[GitTreeElement]
+    ) -> Iterator[discoveryengine.Document]:
+        """Yields schema documents for the 'service-catalog/**' templates found in the tree."""
         try:
-            # Assuming SC products are in 'service-catalog'
-            contents = repo.get_contents("service-catalog")
-            while contents:
-                file_content = contents.pop(0)
-                if file_content.type == "dir":
-                    contents.extend(repo.get_contents(file_content.path))
-                elif file_content.name.endswith((".yaml", ".yml", ".json")):
-                    # Found a CFN template
-                    product_name = os.path.splitext(file_content.name)[0]
-                    
-                    schema = self._parse_cfn_parameters(file_content)
-                    if schema:
-                        doc = self._create_vertex_document(
-                            id=f"sc-{product_name}",
-                            title=f"Service Catalog Product: {product_name}",
-                            category="Service Catalog Product",
-                            content=json.dumps(schema, indent=2),
-                            uri=file_content.html_url
-                        )
-                        docs.append(doc)
+            texts = self._fetch_blob_texts(repo, ref, cfn_files)
+            for blob in cfn_files:
+                # Found a CFN template
+                path = blob.path
+                if path not in texts:
+                    continue
+                product_name = os.path.splitext(os.path.basename(path))[0]
+                
+                schema = self._cached_schema(blob, texts[path], self._parse_cfn_parameters)
+                if schema:
+                    doc = self._create_vertex_document(
+                        id=f"sc-{product_name}",
+                        title=f"Service Catalog Product: {product_name}",
+                        category="Service Catalog Product",
+                        schema=schema,
+                        uri=f"{repo.html_url}/blob/{repo.default_branch}/{path}"
+                    )
+                    yield doc
         except Exception as e:
             logger.warning(f"Error processing Service Catalog templates: {e}")
-        return docs
 
-    def _parse_cfn_parameters(self, content_file: ContentFile) -> Optional[Dict[str, Any]]:
+    def _parse_cfn_parameters(self, path: str, content_str: str) -> Optional[Dict[str, Any]]:
         """Parses CloudFormation Parameters section."""
         try:
-            content_str = base64.b64decode(content_file.content).decode("utf-8")
             # Parse YAML (JSON is valid YAML)
-            template = yaml.safe_load(content_str)
+            template = yaml.load(content_str, Loader=_CfnLoader)
             
             parameters = {}
             for name, config in template.get("Parameters", {}).items():
@@ -263,15 +785,17 @@ class ComponentCatalogPipeline:
                 
             return {
                 "type": "service_catalog_product",
-                "source": content_file.path,
+                "source": path,
                 "attributes": parameters
             }
         except Exception as e:
-            logger.error(f"Failed to parse CFN for {content_file.path}: {e}")
+            logger.error(f"Failed to parse CFN for {path}: {e}")
             return None
 
-    def _create_vertex_document(self, id: str, title: str, category: str, content: str, uri: str) -> discoveryengine.Document:
+    def _create_vertex_document(self, id: str, title: str, category: str, schema: Dict[str, Any], uri: str) -> discoveryengine.Document:
         """Constructs a Vertex AI Search Document object."""
+        # Compact orjson output: serialized once, already UTF-8 bytes for the content.
+        raw = orjson.dumps(schema, default=str, option=orjson.OPT_NON_STR_KEYS)
         return discoveryengine.Document(
             id=id,
             schema_id="default_schema", # Or specific schema if configured
@@ -279,16 +803,70 @@ class ComponentCatalogPipeline:
                 "title": title,
                 "category": category,
                 "uri": uri,
-                "original_content": content # The full JSON schema for checking
+                "preview": raw[:SCHEMA_PREVIEW_BYTES].decode("utf-8", errors="ignore")
             },
             content=discoveryengine.Document.Content(
                 mime_type="application/json",
-                raw_bytes=content.encode("utf-8")
+                raw_bytes=raw
             )
         )
 
-    def _index_documents(self, documents: List[discoveryengine.Document]):
-        """Uploads documents to Vertex AI Search."""
+    def _index_stream(self, documents: Iterable[discoveryengine.Document]) -> int:
+        """
+        Imports documents in fixed-size batches as they are produced; returns the count.
+
+        Batches compose because every import uses INCREMENTAL reconciliation.
+        Documents whose fingerprint matches the last import are skipped but still
+        counted. Documents the import rejected are neither counted nor
+        fingerprinted, so they are sent again on the next run.
+        """
+        batch_size = GCS_IMPORT_BATCH_DOCS if self.staging_bucket else INLINE_IMPORT_MAX_DOCS
+        count = 0
+        unchanged = 0
+
+        def changed_documents():
+            nonlocal count, unchanged
+            for doc in documents:
+                count += 1
+                fingerprint = _document_fingerprint(doc)
+                if self._fingerprints.get(doc.id) == fingerprint:
+                    unchanged += 1
+                    continue
+                yield doc, fingerprint
+
+        pending = changed_documents()
+        while True:
+            batch = list(islice(pending, batch_size))
+            if not batch:
+                break
+            failed_ids = self._index_documents([doc for doc, _ in batch])
+            count -= len(failed_ids)
+            self._record_fingerprints(
+                {doc.id: fingerprint for doc, fingerprint in batch if doc.id not in failed_ids}
+            )
+
+        if unchanged:
+            logger.info(f"Skipped {unchanged} unchanged documents.")
+        return count
+
+    def _load_fingerprints(self) -> Dict[str, str]:
+        try:
+            with open(self._fingerprints_path, "rb") as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _record_fingerprints(self, fingerprints: Dict[str, str]):
+        """Merges fingerprints of a successfully imported batch and persists the map."""
+        with self._fingerprints_lock:
+            self._fingerprints.update(fingerprints)
+            tmp_path = f"{self._fingerprints_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(self._fingerprints))
+            os.replace(tmp_path, self._fingerprints_path)
+
+    def _index_documents(self, documents: List[discoveryengine.Document]) -> Set[str]:
+        """Uploads documents to Vertex AI Search; returns the IDs that failed to import."""
         parent = self.client.branch_path(
             project=self.project_id,
             location=self.location,
@@ -296,20 +874,83 @@ class ComponentCatalogPipeline:
             branch="default_branch",
         )
 
-        request = discoveryengine.ImportDocumentsRequest(
-            parent=parent,
-            request_metadata=discoveryengine.RequestMetadata(user_id="engen-ingestion-service"),
-            inline_source=discoveryengine.ImportDocumentsRequest.InlineSource(
-                documents=documents
-            ),
-            reconciliation_mode=discoveryengine.ImportDocumentsRequest.ReconciliationMode.INCREMENTAL
-        )
+        if self.staging_bucket and len(documents) > INLINE_IMPORT_MAX_DOCS:
+            # Bulk path: the service reads the staged file and imports it in parallel,
+            # with no per-request payload ceiling.
+            request = discoveryengine.ImportDocumentsRequest(
+                parent=parent,
+                gcs_source=discoveryengine.GcsSource(
+                    input_uris=[self._stage_documents_to_gcs(documents)],
+                    data_schema="document"
+                ),
+                reconciliation_mode=discoveryengine.ImportDocumentsRequest.ReconciliationMode.INCREMENTAL
+            )
+        else:
+            request = discoveryengine.ImportDocumentsRequest(
+                parent=parent,
+                inline_source=discoveryengine.ImportDocumentsRequest.InlineSource(
+                    documents=documents
+                ),
+                reconciliation_mode=discoveryengine.ImportDocumentsRequest.ReconciliationMode.INCREMENTAL
+            )
 
         operation = self.client.import_documents(request=request)
         logger.info(f"Waiting for import operation {operation.operation.name} to complete...")
         response = operation.result()
         logger.info(f"Import completed. Metadata: {response}")
 
+        failed_ids = failed_document_ids((doc.id for doc in documents), response, operation.metadata)
+        if failed_ids is None:
+            # The rejected documents are unknown, so none of the batch is
+            # recorded; it is all sent again on the next run.
+            failed_ids = {doc.id for doc in documents}
+        if failed_ids:
+            logger.error(
+                f"{len(failed_ids)} of {len(documents)} documents failed to import and "
+                f"will be retried on the next run: {', '.join(sorted(failed_ids))}"
+            )
+        return failed_ids
+
+    def _stage_documents_to_gcs(self, documents: List[discoveryengine.Document]) -> str:
+        """
+        Writes documents as NDJSON to the staging bucket and returns the gs:// URI.
+
+        The object is named after a digest of its contents, so a batch that is
+        staged again (a retried or repeated run) maps to the same object and is
+        not uploaded twice, and distinct batches cannot collide.
+        """
+        bucket = self.storage_client.bucket(self.staging_bucket)
+
+        with tempfile.NamedTemporaryFile("wb", suffix=".ndjson") as ndjson:
+            digest = hashlib.blake2b(digest_size=16)
+            for doc in documents:
+                line = (discoveryengine.Document.to_json(doc, indent=None) + "\n").encode("utf-8")
+                digest.update(line)
+                ndjson.write(line)
+            ndjson.flush()
+
+            blob_name = f"ingestion/{digest.hexdigest()}.ndjson"
+            blob = bucket.blob(blob_name)
+            if blob.exists():
+                logger.info(f"Batch already staged as {blob_name}; skipping upload")
+            elif ndjson.tell() > STAGING_UPLOAD_PART_BYTES:
+                # Large batches: parts are uploaded concurrently on threads, so
+                # throughput is not bound by a single TCP stream.
+                transfer_manager.upload_chunks_concurrently(
+                    ndjson.name,
+                    blob,
+                    content_type="application/x-ndjson",
+                    chunk_size=STAGING_UPLOAD_PART_BYTES,
+                    max_workers=STAGING_UPLOAD_WORKERS,
+                    worker_type=transfer_manager.THREAD,
+                )
+            else:
+                blob.upload_from_filename(ndjson.name, content_type="application/x-ndjson")
+
+        gcs_uri = f"gs://{self.staging_bucket}/{blob_name}"
+        logger.info(f"Staged {len(documents)} documents to {gcs_uri}")
+        return gcs_uri
+
 if __name__ == "__main__":
     pipeline = ComponentCatalogPipeline()
     pipeline.run()
@@ -14,21 +14,114 @@ Key differences from the pattern ingestion pipeline (vertex_search_pipeline.py):
   4. Chunks are split by DR strategy then by lifecycle phase, not arbitrarily.
 """
 
+import asyncio
+import hashlib
 import json
 import logging
 import os
 import re
 import sys
-from typing import Dict, Any, List, Optional, Tuple
-
-from bs4 import BeautifulSoup
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from itertools import islice
+from typing import Dict, Any, List, Optional, Pattern, Tuple
+
+from lxml import etree
+from lxml import html as lxml_html
+from google.api_core.exceptions import PreconditionFailed
 from google.cloud import storage
 from google.cloud import discoveryengine_v1 as discoveryengine
 import vertexai
 from vertexai.generative_models import GenerativeModel, Part
 
+# Shared ingestion helpers live in the service root, which is not on sys.path
+# when a pipeline is run as a script.
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICE_ROOT not in sys.path:
+    sys.path.append(_SERVICE_ROOT)
+
+from indexing import failed_document_ids  # noqa: E402
+
 logger = logging.getLogger(__name__)
 
+# Services processed concurrently by default. Each service is dominated by
+# network waits (SharePoint, Gemini, GCS, Vertex AI Search), not local CPU.
+DEFAULT_SERVICE_CONCURRENCY = 8
+
+# Chunks upserted per ImportDocuments call (the inline-source maximum).
+IMPORT_BATCH_SIZE = 100
+
+# Import batches in flight per service. A service rarely exceeds one batch;
+# long pages with more chunks still need not wait on each batch in turn.
+INDEX_CONCURRENCY = 4
+
+# Diagrams downloaded/described/uploaded at once per service. Each one is a
+# SharePoint download, a Gemini call and a GCS upload, all network waits.
+IMAGE_CONCURRENCY = 5
+
+# Diagrams described per Gemini request. One multimodal request for several
+# diagrams pays the round-trip and time-to-first-token once instead of per image.
+DESCRIBE_BATCH_SIZE = 4
+
+# Sections with less non-whitespace text than this (e.g. a lone heading line)
+# carry nothing retrievable and are not chunked or indexed.
+MIN_SECTION_CHARS = 10
+
+# GCS caps an object's custom metadata at 8 KiB; longer descriptions are not persisted.
+_MAX_STORED_DESCRIPTION_BYTES = 7 * 1024
+
+# Characters replaced with "_" when a service name is used in GCS paths / doc IDs.
+_UNSAFE_NAME_CHARS_RE = re.compile(r"[^a-zA-Z0-9_-]")
+
+# Icons and thumbnails are recognised from markup alone, before any download:
+# an explicit pixel size below _MIN_DIAGRAM_PX, or a src that points at an SVG,
+# a thumbnail rendition, an emoji or SharePoint's built-in UI images.
+_MIN_DIAGRAM_PX = 64
+_PIXEL_SIZE_RE = re.compile(r"\s*(\d+)\s*(?:px)?\s*$", re.IGNORECASE)
+_ICON_SRC_RE = re.compile(
+    r"\.svg(?:[?#]|$)|(?:^|/)thumbnails?/|_small\.|emoji|/_layouts/\d+/images/",
+    re.IGNORECASE,
+)
+
+
+# Structured output of a batched description request: one entry per diagram.
+_DIAGRAM_DESCRIPTIONS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "diagram": {"type": "integer"},
+            "description": {"type": "string"},
+        },
+        "required": ["diagram", "description"],
+    },
+}
+
+
+def _stored_description(blob: Optional[storage.Blob]) -> Optional[str]:
+    """Description persisted in a stored diagram's object metadata, if any."""
+    if blob is None or not blob.metadata:
+        return None
+    return blob.metadata.get("description")
+
+
+def _is_icon(img) -> bool:
+    """True if an <img> element is clearly not a diagram."""
+    for attr in ("width", "height"):
+        size = _PIXEL_SIZE_RE.match(img.get(attr) or "")
+        if size and int(size.group(1)) < _MIN_DIAGRAM_PX:
+            return True
+    return bool(_ICON_SRC_RE.search(img.get("src") or ""))
+
+
+@lru_cache(maxsize=None)
+def _vision_model(project_id: str) -> GenerativeModel:
+    """Gemini Vision model shared by every pipeline instance in the process."""
+    vertexai.init(project=project_id, location="us-central1")
+    return GenerativeModel("gemini-1.5-flash")
+
+
 # ─── Section heading detection ────────────────────────────────────────────
 
 DR_STRATEGY_PATTERNS: Dict[str, List[str]] = {
@@ -72,6 +165,19 @@ LIFECYCLE_PHASE_PATTERNS: Dict[str, List[str]] = {
 }
 
 
+def _compile_heading_patterns(patterns: Dict[str, List[str]]) -> Dict[str, Pattern]:
+    """One compiled alternation per category, in the category order given."""
+    return {
+        category: re.compile("|".join(f"(?:{regex})" for regex in regexes))
+        for category, regexes in patterns.items()
+    }
+
+
+# Compiled once at import; every line of every document is tested against them.
+_DR_STRATEGY_RES = _compile_heading_patterns(DR_STRATEGY_PATTERNS)
+_LIFECYCLE_PHASE_RES = _compile_heading_patterns(LIFECYCLE_PHASE_PATTERNS)
+
+
 class ServiceHADRIngestionPipeline:
     """
     Ingests service-level HA/DR documents into Vertex AI Search with
@@ -85,6 +191,8 @@ class ServiceHADRIngestionPipeline:
         location: str = "global",
         data_store_id: str = "service-hadr-datastore",
         gcs_bucket_name: str = "engen-service-hadr-images",
+        clients=None,
+        concurrency: Optional[int] = None,
     ):
         """
         Args:
@@ -93,18 +201,40 @@ class ServiceHADRIngestionPipeline:
             location:         Vertex AI Search location.
             data_store_id:    Target data store for service HA/DR docs.
             gcs_bucket_name:  Bucket for storing extracted HA/DR diagram images.
+            clients:          Optional GCPClients bundle to share; built
+                              here if omitted.
+            concurrency:      Services processed at once (default
+                              DEFAULT_SERVICE_CONCURRENCY).
         """
         self.sp_client = sp_client
         self.project_id = project_id
         self.location = location
         self.data_store_id = data_store_id
+        self.concurrency = concurrency or DEFAULT_SERVICE_CONCURRENCY
+
+        # GCS + Vertex AI Search Document API and the Vision model are built
+        # on first use (see the properties below); the caller's warm clients
+        # are reused when given.
+        self._clients = clients
+        self.gcs_bucket_name = gcs_bucket_name
+
+        # Shared by all services; each submits its chunks / diagrams and
+        # waits for them.
+        self.index_pool = ThreadPoolExecutor(
+            max_workers=INDEX_CONCURRENCY * self.concurrency,
+            thread_name_prefix="hadr-index",
+        )
+        self.image_pool = ThreadPoolExecutor(
+            max_workers=IMAGE_CONCURRENCY * self.concurrency,
+            thread_name_prefix="hadr-image",
+        )
 
-        # GCS
-        self.storage_client = storage.Client(project=project_id)
-        self.bucket = self.storage_client.bucket(gcs_bucket_name)
-
-        # Vertex AI Search — Document API
-        self.doc_client = discoveryengine.DocumentServiceClient()
+        # Diagram descriptions keyed by SHA-256 of the image bytes.  Service
+        # pages reuse the same reference diagrams; only the first occurrence
+        # pays for a Gemini call.  Services are processed on concurrent worker
+        # threads, so every read and write goes through the lock.
+        self._description_cache: Dict[str, str] = {}
+        self._description_cache_lock = threading.Lock()
         self.branch = (
             f"projects/{self.project_id}"
             f"/locations/{self.location}"
@@ -113,16 +243,53 @@ class ServiceHADRIngestionPipeline:
             f"/branches/default_branch"
         )
 
-        # Vertex AI — Vision model for diagram descriptions
-        vertexai.init(project=project_id, location="us-central1")
-        self.vision_model = GenerativeModel("gemini-1.5-flash")
+    @cached_property
+    def storage_client(self) -> storage.Client:
+        if self._clients is not None:
+            return self._clients.storage
+        return storage.Client(project=self.project_id)
+
+    @cached_property
+    def doc_client(self) -> discoveryengine.DocumentServiceClient:
+        if self._clients is not None:
+            return self._clients.documents
+        return discoveryengine.DocumentServiceClient()
+
+    @cached_property
+    def bucket(self) -> storage.Bucket:
+        return self.storage_client.bucket(self.gcs_bucket_name)
+
+    @property
+    def vision_model(self) -> GenerativeModel:
+        """Vertex AI — Vision model for diagram descriptions."""
+        return _vision_model(self.project_id)
 
     # ─── Public API ──────────────────────────────────────────────────────
 
-    def run_ingestion(self, service_list: Optional[List[Dict[str, Any]]] = None):
+    def verify_environment(self):
+        """
+        Pre-flight check that the diagram bucket and the HA/DR data store are
+        reachable.  Uses the pipeline's own clients, so the connections it
+        opens are the ones the ingestion run goes on to use.
+        """
+        next(iter(self.storage_client.list_blobs(self.bucket, max_results=1)), None)
+        self.doc_client.list_documents(
+            request=discoveryengine.ListDocumentsRequest(
+                parent=self.branch, page_size=1
+            )
+        )
+        logger.info(
+            "Environment verified: GCS bucket and HA/DR data store reachable"
+        )
+
+    async def run_ingestion(self, service_list: Optional[List[Dict[str, Any]]] = None):
         """
         Main entry-point: ingests all services in *service_list*.
 
+        Services are processed concurrently, at most ``concurrency`` at a
+        time; the blocking client calls for each one run on a worker thread.
+        A failing service is logged and does not cancel the others.
+
         If *service_list* is not provided the pipeline reads the service
         catalog directly from the SharePoint List identified by
         ``SP_HADR_LIST_ID`` — mirroring how the pattern ingestion pipeline
@@ -137,24 +304,50 @@ class ServiceHADRIngestionPipeline:
                 "page_url": "https://sharepoint.com/sites/.../SitePages/rds-hadr.aspx"
             }
         """
+        # Size the default executor so the semaphore is the effective limit.
+        # It and the shared index/image pools are shut down when the run ends,
+        # so no idle worker threads outlive it.
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        asyncio.get_running_loop().set_default_executor(executor)
+        try:
+            await self._run_services(service_list)
+        finally:
+            executor.shutdown(wait=False)
+            self.index_pool.shutdown(wait=False)
+            self.image_pool.shutdown(wait=False)
+
+    async def _run_services(self, service_list: Optional[List[Dict[str, Any]]]):
+        """Processes every service in *service_list* (read from SharePoint if None)."""
         if service_list is None:
             logger.info(
                 "No service list supplied — fetching from SharePoint List "
                 "(SP_HADR_LIST_ID)..."
             )
-            service_list = self.sp_client.fetch_service_hadr_list()
+            service_list = await asyncio.to_thread(
+                self.sp_client.fetch_service_hadr_list
+            )
 
         logger.info(
             f"Starting service HA/DR ingestion for {len(service_list)} services"
         )
-        for svc_meta in service_list:
-            try:
-                self._process_single_service(svc_meta)
-            except Exception as e:
-                logger.error(
-                    f"Failed to process service '{svc_meta.get('service_name')}': {e}",
-                    exc_info=True,
-                )
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(
+            self._process_service_bounded(svc_meta, semaphore)
+            for svc_meta in service_list
+        ))
+
+    async def _process_service_bounded(
+        self, svc_meta: Dict[str, Any], semaphore: asyncio.Semaphore
+    ):
+        """Processes one service under *semaphore*, logging any failure."""
+        try:
+            async with semaphore:
+                await asyncio.to_thread(self._process_single_service, svc_meta)
+        except Exception as e:
+            logger.error(
+                f"Failed to process service '{svc_meta.get('service_name')}': {e}",
+                exc_info=True,
+            )
 
     def _process_single_service(self, svc_meta: Dict[str, Any]):
         svc_name = svc_meta["service_name"]
@@ -180,11 +373,18 @@ class ServiceHADRIngestionPipeline:
         chunks = self._chunk_document(plain_text, svc_meta, diagram_records)
 
         # 5. Index chunks in Vertex AI Search
-        self._index_chunks(chunks)
+        failed = self._index_chunks(chunks)
 
-        logger.info(
-            f"Finished {svc_name}: {len(chunks)} chunks indexed"
-        )
+        if failed >= len(chunks):
+            logger.error(f"Failed {svc_name}: none of {len(chunks)} chunks indexed")
+        elif failed:
+            logger.error(
+                f"Partially indexed {svc_name}: {failed} of {len(chunks)} chunks failed"
+            )
+        else:
+            logger.info(
+                f"Finished {svc_name}: {len(chunks)} chunks indexed"
+            )
 
     # ─── Image handling ──────────────────────────────────────────────────
 
@@ -203,43 +403,97 @@ class ServiceHADRIngestionPipeline:
                               ``description``, and ``diagram_index`` so the
                               chunker can attach them to the correct chunks.
         """
-        soup = BeautifulSoup(html_content, "html.parser")
         descriptions: List[str] = []
         diagram_records: List[Dict[str, Any]] = []
 
-        safe_name = re.sub(r"[^a-zA-Z0-9_-]", "_", service_name)
-
-        for idx, img_tag in enumerate(soup.find_all("img")):
+        # lxml parses and walks the page in C; nothing here needs a
+        # BeautifulSoup tree, only the <img> elements and the final text.
+        try:
+            root = lxml_html.document_fromstring(html_content)
+        except etree.ParserError:
+            # Whitespace-only / empty page body
+            return "", descriptions, diagram_records
+
+        safe_name = _UNSAFE_NAME_CHARS_RE.sub("_", service_name)
+
+        # Diagrams are independent network round-trips, so each stage runs
+        # concurrently on ``image_pool``; the tree is only mutated afterwards,
+        # on this thread, in document order.
+        # A. Download every diagram (each src once) and look up its stored object.
+        pending = []
+        fetches_by_src = {}
+        for idx, img_tag in enumerate(root.iter("img")):
             original_src = img_tag.get("src")
-            if not original_src:
+            if not original_src or _is_icon(img_tag):
                 continue
-
-            # Download image bytes
-            try:
-                image_bytes = self.sp_client.download_image(original_src)
-                if not image_bytes:
-                    continue
-            except Exception as e:
-                logger.warning(f"Image download failed ({original_src}): {e}")
+            if original_src not in fetches_by_src:
+                fetches_by_src[original_src] = self.image_pool.submit(
+                    self._fetch_diagram, original_src, safe_name
+                )
+            pending.append((
+                idx, img_tag, img_tag.get("alt", "HA/DR diagram"),
+                fetches_by_src[original_src],
+            ))
+        fetched = []
+        for idx, img_tag, alt_text, future in pending:
+            diagram = future.result()
+            if diagram is not None:
+                fetched.append((idx, img_tag, alt_text, diagram))
+
+        # Each distinct diagram (by GCS path) is described and stored once,
+        # however often the page repeats it.
+        distinct: Dict[str, Tuple[bytes, str, str, Optional[storage.Blob]]] = {}
+        for *_, diagram in fetched:
+            distinct.setdefault(diagram[2], diagram)
+
+        # B. Describe, in batched Gemini requests, the diagrams with no
+        # description stored in GCS or memoized earlier in this run.
+        with self._description_cache_lock:
+            known = {
+                image_key: self._description_cache.get(image_key)
+                for _, image_key, _, _ in distinct.values()
+            }
+        to_describe: Dict[str, bytes] = {}
+        for image_bytes, image_key, _, stored in distinct.values():
+            if known[image_key]:
                 continue
+            known[image_key] = _stored_description(stored)
+            if not known[image_key]:
+                to_describe[image_key] = image_bytes
+        keys = list(to_describe)
+        batches = [
+            self.image_pool.submit(
+                self._describe_diagrams,
+                [to_describe[key] for key in keys[i:i + DESCRIBE_BATCH_SIZE]],
+            )
+            for i in range(0, len(keys), DESCRIBE_BATCH_SIZE)
+        ]
+        generated = [description for batch in batches for description in batch.result()]
+        for key, description in zip(keys, generated):
+            known[key] = description
+        with self._description_cache_lock:
+            # Failed descriptions (None) are not cached.
+            self._description_cache.update(
+                (key, description) for key, description in known.items() if description
+            )
 
-            # Generate description with Gemini Vision
-            alt_text = img_tag.get("alt", "HA/DR diagram")
-            description = self._describe_diagram(image_bytes, alt_text)
+        # C. Upload new diagrams; record the description on stored diagrams
+        # that do not carry one yet.
+        gcs_urls = {
+            gcs_path: self.image_pool.submit(
+                self._store_diagram, gcs_path, image_bytes, stored,
+                known[image_key],
+            )
+            for gcs_path, (image_bytes, image_key, _, stored) in distinct.items()
+        }
+
+        for idx, img_tag, alt_text, (_, image_key, gcs_path, _) in fetched:
+            description = known[image_key] or alt_text
+            gcs_url = gcs_urls[gcs_path].result()
             descriptions.append(
                 f"[DIAGRAM {idx + 1}: {alt_text}] {description}"
             )
 
-            # Upload image to GCS
-            gcs_path = f"services/{safe_name}/hadr-diagrams/diagram_{idx}.png"
-            gcs_url = ""
-            try:
-                blob = self.bucket.blob(gcs_path)
-                blob.upload_from_string(image_bytes, content_type="image/png")
-                gcs_url = f"gs://{self.bucket.name}/{gcs_path}"
-            except Exception as e:
-                logger.warning(f"GCS upload failed for {gcs_path}: {e}")
-
             # Record diagram metadata for later attachment to chunks
             diagram_records.append({
                 "diagram_index": idx,
@@ -250,16 +504,145 @@ class ServiceHADRIngestionPipeline:
             # Replace <img> tag with a marked paragraph so we can trace
             # which diagram ended up in which section during chunking.
             # The marker tag carries a data attribute with the diagram index.
-            replacement = soup.new_tag("p")
-            replacement["data-diagram-idx"] = str(idx)
-            replacement.string = f"[DIAGRAM {idx}: {description}]"
-            img_tag.replace_with(replacement)
-
-        plain_text = soup.get_text(separator="\n", strip=True)
+            replacement = etree.Element("p", {"data-diagram-idx": str(idx)})
+            replacement.text = f"[DIAGRAM {idx}: {description}]"
+            replacement.tail = img_tag.tail
+            img_tag.getparent().replace(img_tag, replacement)
+
+        # One pass over the text nodes, one join. Comments and script/style
+        # bodies are not page text and are dropped first.
+        etree.strip_elements(root, etree.Comment, "script", "style", with_tail=False)
+        plain_text = "\n".join(
+            text for text in (node.strip() for node in root.itertext()) if text
+        )
         return plain_text, descriptions, diagram_records
 
-    def _describe_diagram(self, image_bytes: bytes, alt_text: str) -> str:
-        """Use Gemini Vision to describe an HA/DR diagram."""
+    def _fetch_diagram(
+        self, src: str, safe_name: str
+    ) -> Optional[Tuple[bytes, str, str, Optional[storage.Blob]]]:
+        """
+        Downloads one diagram and looks up its stored GCS object.
+
+        Diagrams are stored under the service by content hash, with their
+        description in the object metadata, so a re-run over an unchanged
+        page neither re-uploads nor re-describes them.
+
+        Returns ``(image_bytes, sha256_hex, gcs_path, stored_blob_or_None)``,
+        or None if the image could not be downloaded.
+        """
+        try:
+            image_bytes = self.sp_client.download_image(src)
+            if not image_bytes:
+                return None
+        except Exception as e:
+            logger.warning(f"Image download failed ({src}): {e}")
+            return None
+
+        image_key = hashlib.sha256(image_bytes).hexdigest()
+        gcs_path = f"services/{safe_name}/hadr-diagrams/{image_key}.png"
+        return image_bytes, image_key, gcs_path, self._get_stored_diagram(gcs_path)
+
+    def _store_diagram(
+        self,
+        gcs_path: str,
+        image_bytes: bytes,
+        stored: Optional[storage.Blob],
+        description: Optional[str],
+    ) -> str:
+        """
+        Uploads a new diagram, or records *description* on a stored one that
+        lacks it.  Returns its ``gs://`` URL, or "" if the upload failed.
+        """
+        try:
+            if stored is None:
+                self._upload_diagram(gcs_path, image_bytes, description)
+            elif description and not _stored_description(stored):
+                self._store_description(stored, description)
+            return f"gs://{self.bucket.name}/{gcs_path}"
+        except Exception as e:
+            logger.warning(f"GCS upload failed for {gcs_path}: {e}")
+            return ""
+
+    def _get_stored_diagram(self, gcs_path: str) -> Optional[storage.Blob]:
+        """Stored diagram object (with its metadata), or None if not uploaded yet."""
+        try:
+            return self.bucket.get_blob(gcs_path)
+        except Exception as e:
+            logger.warning(f"Failed to look up {gcs_path}: {e}")
+            return None
+
+    def _upload_diagram(self, gcs_path: str, image_bytes: bytes, description: Optional[str]):
+        """Uploads a new diagram, carrying *description* as object metadata."""
+        blob = self.bucket.blob(gcs_path)
+        if description and len(description.encode("utf-8")) <= _MAX_STORED_DESCRIPTION_BYTES:
+            blob.metadata = {"description": description}
+        try:
+            blob.upload_from_string(
+                image_bytes, content_type="image/png", if_generation_match=0
+            )
+        except PreconditionFailed:
+            pass  # Same content uploaded concurrently for this service.
+
+    def _store_description(self, blob: storage.Blob, description: str):
+        """Records a newly generated description on an already stored diagram."""
+        if len(description.encode("utf-8")) > _MAX_STORED_DESCRIPTION_BYTES:
+            return
+        try:
+            blob.metadata = {"description": description}
+            blob.patch()
+        except Exception as e:
+            logger.warning(f"Failed to store description on {blob.name}: {e}")
+
+    def _describe_diagrams(self, images: List[bytes]) -> List[Optional[str]]:
+        """
+        Describes up to DESCRIBE_BATCH_SIZE diagrams with one Gemini request.
+
+        The model returns a JSON array (enforced via response_schema) with one
+        entry per diagram; if that cannot be parsed, each image is described
+        with its own request.  Entries are None where no description could be
+        generated.
+        """
+        if len(images) > 1:
+            prompt = (
+                f"Analyse each of the {len(images)} HA/DR architecture diagrams "
+                "that follow, in order.  For each, describe the infrastructure "
+                "components, their redundancy setup, replication flows, and "
+                "failover mechanisms.  Be concise but technically precise.  "
+                'Return a JSON array with one object per diagram: '
+                '{"diagram": <1-based number>, "description": "..."}.'
+            )
+            parts = [prompt] + [
+                Part.from_data(data=image_bytes, mime_type="image/png")
+                for image_bytes in images
+            ]
+            try:
+                response = self.vision_model.generate_content(
+                    parts,
+                    generation_config={
+                        "max_output_tokens": 512 * len(images),
+                        "temperature": 0.2,
+                        "response_mime_type": "application/json",
+                        "response_schema": _DIAGRAM_DESCRIPTIONS_SCHEMA,
+                    },
+                )
+                by_number = {
+                    int(entry["diagram"]): entry["description"].strip()
+                    for entry in json.loads(response.text)
+                }
+                if all(by_number.get(n) for n in range(1, len(images) + 1)):
+                    return [by_number[n] for n in range(1, len(images) + 1)]
+                logger.warning("Batched diagram description was incomplete; describing diagrams individually")
+            except Exception as e:
+                logger.warning(f"Batched diagram description failed ({e}); describing diagrams individually")
+
+        return [self._describe_diagram(image_bytes) for image_bytes in images]
+
+    def _describe_diagram(self, image_bytes: bytes) -> Optional[str]:
+        """
+        Use Gemini Vision to describe one HA/DR diagram.
+
+        Returns None if the call fails.
+        """
         prompt = (
             "Analyse this HA/DR architecture diagram.  "
             "Describe the infrastructure components, their redundancy setup, "
@@ -275,7 +658,7 @@ class ServiceHADRIngestionPipeline:
             return response.text.strip()
         except Exception as e:
             logger.warning(f"Diagram description failed: {e}")
-            return alt_text
+            return None
 
     # ─── Chunking ────────────────────────────────────────────────────────
 
@@ -310,16 +693,20 @@ class ServiceHADRIngestionPipeline:
             marker_prefix = f"[DIAGRAM {rec['diagram_index']}:"
             _diagram_lookup[marker_prefix] = rec
 
-        strategy_sections = self._split_by_heading(
-            content, DR_STRATEGY_PATTERNS
-        )
+        # Per-service invariants, computed once instead of once per chunk.
+        safe_name = _UNSAFE_NAME_CHARS_RE.sub("_", svc_meta["service_name"])
+        service_fields = {
+            "service_name": svc_meta["service_name"],
+            "service_description": svc_meta.get("service_description", ""),
+            "service_type": svc_meta.get("service_type", ""),
+        }
 
-        for strategy, strategy_text in strategy_sections.items():
-            phase_sections = self._split_by_heading(
-                strategy_text, LIFECYCLE_PHASE_PATTERNS
-            )
+        sections = self._split_by_strategy_and_phase(content)
 
+        for strategy, phase_sections in sections.items():
             for phase, phase_text in phase_sections.items():
+                if len(phase_text.strip()) < MIN_SECTION_CHARS:
+                    continue
                 for text_chunk in self._window_chunk(
                     phase_text, max_chunk_words, overlap_words
                 ):
@@ -333,19 +720,10 @@ class ServiceHADRIngestionPipeline:
                             if rec.get("description"):
                                 chunk_diagram_descs.append(rec["description"])
 
-                    doc_id = (
-                        re.sub(r"[^a-zA-Z0-9_-]", "_", svc_meta["service_name"])
-                        + f"_{chunk_idx}"
-                    )
+                    doc_id = f"{safe_name}_{chunk_idx}"
 
                     struct_data = {
-                        "service_name": svc_meta["service_name"],
-                        "service_description": svc_meta.get(
-                            "service_description", ""
-                        ),
-                        "service_type": svc_meta.get(
-                            "service_type", ""
-                        ),
+                        **service_fields,
                         "dr_strategy": strategy,
                         "lifecycle_phase": phase,
                         "chunk_index": chunk_idx,
@@ -376,39 +754,46 @@ class ServiceHADRIngestionPipeline:
 
     @staticmethod
     def _detect_category(
-        line: str, patterns: Dict[str, List[str]]
+        line: str, patterns: Dict[str, Pattern]
     ) -> Optional[str]:
-        """Check whether *line* matches any of the heading patterns."""
+        """Return the first category whose compiled heading pattern matches *line*."""
         line_lower = line.lower()
-        for category, regexes in patterns.items():
-            for regex in regexes:
-                if re.search(regex, line_lower):
-                    return category
+        for category, regex in patterns.items():
+            if regex.search(line_lower):
+                return category
         return None
 
-    def _split_by_heading(
-        self, content: str, patterns: Dict[str, List[str]]
-    ) -> Dict[str, str]:
+    def _split_by_strategy_and_phase(
+        self, content: str
+    ) -> Dict[str, Dict[str, str]]:
         """
-        Split *content* into named sections using *patterns* for heading
-        detection.  Lines before the first recognised heading are stored
-        under the key ``"general"``.
+        Split *content* into ``{strategy: {phase: text}}`` in a single walk
+        over its lines.
+
+        A DR strategy heading switches the current strategy and a lifecycle
+        phase heading switches the current phase; lines before the first
+        recognised heading of either kind fall under ``"general"``.  Each
+        strategy keeps its own current phase, so text under a repeated
+        strategy heading resumes that strategy's last phase.  Sections are
+        ordered by first appearance.
         """
-        sections: Dict[str, List[str]] = {}
-        current_key = "general"
-        sections[current_key] = []
+        sections: Dict[str, Dict[str, List[str]]] = {}
+        current_phase: Dict[str, str] = {}
+        strategy = "general"
 
         for line in content.split("\n"):
-            detected = self._detect_category(line, patterns)
-            if detected:
-                current_key = detected
-                if current_key not in sections:
-                    sections[current_key] = []
-                sections[current_key].append(line)
-            else:
-                sections[current_key].append(line)
+            strategy = self._detect_category(line, _DR_STRATEGY_RES) or strategy
+            phase = (
+                self._detect_category(line, _LIFECYCLE_PHASE_RES)
+                or current_phase.get(strategy, "general")
+            )
+            current_phase[strategy] = phase
+            sections.setdefault(strategy, {}).setdefault(phase, []).append(line)
 
-        return {k: "\n".join(v) for k, v in sections.items() if v}
+        return {
+            strategy: {phase: "\n".join(lines) for phase, lines in phases.items()}
+            for strategy, phases in sections.items()
+        }
 
     @staticmethod
     def _window_chunk(
@@ -430,11 +815,34 @@ class ServiceHADRIngestionPipeline:
 
     # ─── Vertex AI Search indexing ───────────────────────────────────────
 
-    def _index_chunks(self, chunks: List[Dict[str, Any]]):
-        """Upsert each chunk as a Document in Vertex AI Search."""
-        for chunk in chunks:
-            try:
-                document = discoveryengine.Document(
+    def _index_chunks(self, chunks: List[Dict[str, Any]]) -> int:
+        """
+        Upsert the chunks as Documents in Vertex AI Search; returns how many
+        of them failed to import.
+
+        Chunks go out in ImportDocuments calls of up to ``IMPORT_BATCH_SIZE``
+        rather than one CreateDocument per chunk.  INCREMENTAL reconciliation
+        makes each call an upsert, so re-ingesting a service overwrites its
+        existing chunks instead of failing on them.  Batches are issued
+        concurrently on ``index_pool``; this returns once all have finished.
+        """
+        pending = iter(chunks)
+        futures = []
+        while True:
+            batch = list(islice(pending, IMPORT_BATCH_SIZE))
+            if not batch:
+                break
+            futures.append(self.index_pool.submit(self._import_chunk_batch, batch))
+        return sum(future.result() for future in futures)
+
+    def _import_chunk_batch(self, chunks: List[Dict[str, Any]]) -> int:
+        """
+        Imports one batch of chunks; returns how many failed, counting the
+        chunks the import rejected as well as a batch that failed outright.
+        """
+        try:
+            documents = [
+                discoveryengine.Document(
                     id=chunk["id"],
                     struct_data=chunk["struct_data"],
                     content=discoveryengine.Document.Content(
@@ -442,14 +850,32 @@ class ServiceHADRIngestionPipeline:
                         mime_type="text/plain",
                     ),
                 )
-                request = discoveryengine.CreateDocumentRequest(
-                    parent=self.branch,
-                    document=document,
-                    document_id=chunk["id"],
-                )
-                self.doc_client.create_document(request=request)
-            except Exception as e:
-                logger.error(f"Failed to index chunk {chunk['id']}: {e}")
+                for chunk in chunks
+            ]
+            request = discoveryengine.ImportDocumentsRequest(
+                parent=self.branch,
+                inline_source=discoveryengine.ImportDocumentsRequest.InlineSource(
+                    documents=documents
+                ),
+                reconciliation_mode=discoveryengine.ImportDocumentsRequest.ReconciliationMode.INCREMENTAL,
+            )
+            operation = self.doc_client.import_documents(request=request)
+            response = operation.result()
+        except Exception as e:
+            logger.error(
+                f"Failed to index chunks {chunks[0]['id']}..{chunks[-1]['id']}: {e}"
+            )
+            return len(chunks)
+
+        for error in getattr(response, "error_samples", None) or []:
+            logger.error(f"Chunk import error: {error.message}")
+        failed_ids = failed_document_ids(
+            (chunk["id"] for chunk in chunks), response, operation.metadata
+        )
+        if failed_ids is None:
+            # More chunks failed than the error samples name.
+            return max(operation.metadata.failure_count, len(response.error_samples))
+        return len(failed_ids)
 
 
 # ─── CLI entry-point ─────────────────────────────────────────────────────
@@ -467,15 +893,15 @@ if __name__ == "__main__":
 
     from config import Config as IngestionConfig
     from clients.sharepoint import SharePointClient
+    from clients.gcp import get_gcp_clients
+    from logging_config import configure_logging
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-    )
+    configure_logging(logging.INFO)
 
     try:
         config = IngestionConfig()
         sp_client = SharePointClient(config)
+        gcp_clients = get_gcp_clients(config.PROJECT_ID)
 
         pipeline = ServiceHADRIngestionPipeline(
             sp_client=sp_client,
@@ -487,12 +913,20 @@ if __name__ == "__main__":
             gcs_bucket_name=os.getenv(
                 "SERVICE_HADR_GCS_BUCKET", "engen-service-hadr-images"
             ),
+            clients=gcp_clients,
+            concurrency=config.SERVICE_HADR_CONCURRENCY,
         )
+        pipeline.verify_environment()
 
         # Fetch the service list from the SharePoint List (same pattern
         # as vertex_search_pipeline.py → sp_client.fetch_pattern_list()).
         # No local JSON file needed.
-        pipeline.run_ingestion()
+        try:
+            import uvloop
+            run = uvloop.run
+        except ImportError:
+            run = asyncio.run
+        run(pipeline.run_ingestion())
 
     except Exception as e:
         logger.error(f"Pipeline execution failed: {e}", exc_info=True)
@@ -12,22 +12,132 @@ Key Features:
 4. Managed Indexing: Pushes final content + metadata to Google Cloud Discovery Engine.
 """
 
+import asyncio
+import hashlib
+import html
+import json
 import logging
-import base64
 import os
+import re
 import sys
-from typing import Dict, List, Any, Tuple
-from bs4 import BeautifulSoup
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from io import BytesIO
+from itertools import islice
+from typing import Dict, List, Any, Optional, Tuple
+from lxml import etree
+from lxml import html as lxml_html
 from dotenv import load_dotenv
 
 # Google Cloud Imports
+from google.api_core.exceptions import PreconditionFailed
 from google.cloud import storage
 from google.cloud import discoveryengine_v1 as discoveryengine
 import vertexai
-from vertexai.generative_models import GenerativeModel, Part, Image
+from vertexai.generative_models import GenerativeModel, Part
+
+# Shared ingestion helpers live in the service root, which is not on sys.path
+# when a pipeline is run as a script.
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICE_ROOT not in sys.path:
+    sys.path.append(_SERVICE_ROOT)
+
+from indexing import failed_document_ids  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
+# Default per-stage concurrency, derived from the host's CPU count.
+# Fetching is I/O-bound (waits on SharePoint), so it can run well beyond ncpu;
+# the transform stage parses HTML and drives the LLM/GCS/Search calls, so it is
+# kept close to ncpu to avoid oversubscribing the interpreter.
+_CPU_COUNT = os.cpu_count() or 1
+DEFAULT_FETCH_CONCURRENCY = min(32, 4 * _CPU_COUNT)
+DEFAULT_TRANSFORM_CONCURRENCY = _CPU_COUNT
+
+# Primed hasher for page content fingerprints. Each pattern clones it with
+# .copy() rather than re-entering the hashlib constructor in the hot loop.
+_HASH_PROTO = hashlib.sha256()
+# Characters encoded per hasher update (bounds the transient UTF-8 copy).
+_HASH_CHUNK_CHARS = 64 * 1024
+
+# GCS caps an object's custom metadata at 8 KiB; longer descriptions are not persisted.
+_MAX_STORED_DESCRIPTION_BYTES = 7 * 1024
+
+@lru_cache(maxsize=None)
+def _vision_model(project_id: str) -> GenerativeModel:
+    """Gemini model shared by every pipeline instance in the process."""
+    # Initialize Vertex AI (LLM)
+    # LLM usually requires regional endpoint (e.g. us-central1) unlike global search
+    vertexai.init(project=project_id, location="us-central1")
+    return GenerativeModel("gemini-1.5-flash") # Efficient multimodal model
+
+
+# Cheap pre-check for pages that embed any image at all.
+_IMG_TAG_RE = re.compile(r"<img\b", re.IGNORECASE)
+
+# <img> elements with a non-blank src, selected by libxml2 in one C-level
+# tree walk. Images without a source can never be downloaded, so they are
+# not candidates for a diagram slot.
+_IMG_WITH_SRC = etree.XPath("//img[normalize-space(@src)]")
+
+# Icons and thumbnails are recognised from markup alone, before any download:
+# an explicit pixel size below _MIN_DIAGRAM_PX, or a src that points at an SVG,
+# a thumbnail rendition, an emoji or SharePoint's built-in UI images.
+_MIN_DIAGRAM_PX = 64
+_PIXEL_SIZE_RE = re.compile(r"\s*(\d+)\s*(?:px)?\s*$", re.IGNORECASE)
+_ICON_SRC_RE = re.compile(
+    r"\.svg(?:[?#]|$)|(?:^|/)thumbnails?/|_small\.|emoji|/_layouts/\d+/images/",
+    re.IGNORECASE,
+)
+
+
+def _is_icon(img) -> bool:
+    """True if an <img> element is clearly not a diagram."""
+    for attr in ("width", "height"):
+        size = _PIXEL_SIZE_RE.match(img.get(attr) or "")
+        if size and int(size.group(1)) < _MIN_DIAGRAM_PX:
+            return True
+    return bool(_ICON_SRC_RE.search(img.get("src") or ""))
+
+# ImportDocuments accepts at most this many documents in an InlineSource.
+IMPORT_BATCH_SIZE = 100
+# ImportDocuments calls (long-running operations) awaited concurrently.
+IMPORT_CONCURRENCY = 4
+# Seconds between completion checks on an in-flight import operation.
+IMPORT_POLL_SECONDS = 2
+
+# Structured-output schema for the batched diagram description request.
+_DIAGRAM_DESCRIPTIONS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "diagram": {"type": "integer"},
+            "description": {"type": "string"},
+        },
+        "required": ["diagram", "description"],
+    },
+}
+
+
+def _content_hash(html_content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Short, stable fingerprint of a pattern's list metadata and page HTML
+    (recorded in the checkpoint log for change detection).
+
+    The page is encoded and fed to the hasher in 64K-character slices, so large
+    pages never need a second full-size bytes copy just to be hashed. UTF-8 is
+    encoded per code point, so the digest equals that of the whole-string encode.
+    """
+    h = _HASH_PROTO.copy()
+    if metadata:
+        # Metadata feeds struct_data, so a list-only edit must change the hash too.
+        h.update(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    for start in range(0, len(html_content), _HASH_CHUNK_CHARS):
+        h.update(html_content[start:start + _HASH_CHUNK_CHARS].encode("utf-8"))
+    return h.digest()[:8].hex()
+
 class VertexSearchPipeline:
     def __init__(
         self, 
@@ -35,7 +145,11 @@ class VertexSearchPipeline:
         project_id: str, 
         location: str, 
         data_store_id: str, 
-        gcs_bucket_name: str
+        gcs_bucket_name: str,
+        fetch_concurrency: Optional[int] = None,
+        transform_concurrency: Optional[int] = None,
+        checkpoint=None,
+        clients=None
     ):
         """
         Args:
@@ -44,34 +158,253 @@ class VertexSearchPipeline:
             location: Vertex AI location (e.g., 'global' or 'us-central1').
             data_store_id: The Vertex AI Search Data Store ID.
             gcs_bucket_name: Name of the bucket to store images.
+            fetch_concurrency: Max SharePoint page fetches in flight.
+            transform_concurrency: Max patterns being transformed/indexed at once.
+            checkpoint: Optional CheckpointLog; patterns whose content is unchanged
+                since their last completed ingestion are skipped.
+            clients: Optional GCPClients bundle to share; built here if omitted.
         """
         self.sp_client = sp_client
         self.project_id = project_id
         self.location = location
         self.data_store_id = data_store_id
+        self.fetch_concurrency = fetch_concurrency or DEFAULT_FETCH_CONCURRENCY
+        self.transform_concurrency = transform_concurrency or DEFAULT_TRANSFORM_CONCURRENCY
+        self.checkpoint = checkpoint
+
+        # Image downloads/uploads are pure I/O; they run here so they overlap with
+        # each other and with the Gemini call (2 downloads + 2 uploads per pattern).
+        self.image_io_pool = ThreadPoolExecutor(
+            max_workers=4 * self.transform_concurrency, thread_name_prefix="image-io"
+        )
+
+        # Diagram descriptions keyed by image content hash. The same diagram is
+        # often embedded in several patterns; only the first one pays for Gemini.
+        self._description_cache: Dict[str, str] = {}
+        self._description_cache_lock = threading.Lock()
         
-        # Initialize GCP Clients
-        self.storage_client = storage.Client(project=project_id)
-        self.bucket = self.storage_client.bucket(gcs_bucket_name)
-        self.doc_client = discoveryengine.DocumentServiceClient()
-        
-        # Initialize Vertex AI (LLM)
-        # LLM usually requires regional endpoint (e.g. us-central1) unlike global search
-        vertexai.init(project=project_id, location="us-central1") 
-        self.vision_model = GenerativeModel("gemini-1.5-flash") # Efficient multimodal model
+        # GCP clients and the Gemini model are built on first use (see the
+        # properties below); the caller's warm clients are reused when given.
+        self._clients = clients
+        self.gcs_bucket_name = gcs_bucket_name
+
+    @cached_property
+    def storage_client(self) -> storage.Client:
+        if self._clients is not None:
+            return self._clients.storage
+        return storage.Client(project=self.project_id)
+
+    @cached_property
+    def doc_client(self) -> discoveryengine.DocumentServiceClient:
+        if self._clients is not None:
+            return self._clients.documents
+        return discoveryengine.DocumentServiceClient()
+
+    @cached_property
+    def bucket(self) -> storage.Bucket:
+        return self.storage_client.bucket(self.gcs_bucket_name)
+
+    @property
+    def vision_model(self) -> GenerativeModel:
+        return _vision_model(self.project_id)
+
+    def verify_environment(self):
+        """
+        Pre-flight check: fails fast if the GCS bucket or the Search data store
+        is unreachable, before any pattern work is started.
+
+        The probes go through the same clients the run uses, so the credentials
+        and connections they establish are reused rather than discarded.
+        """
+        # GCS: list at most one object (needs only objects.list on the bucket)
+        next(iter(self.storage_client.list_blobs(self.bucket, max_results=1)), None)
+
+        # Discovery Engine: read at most one document from the target branch
+        self.doc_client.list_documents(
+            request=discoveryengine.ListDocumentsRequest(parent=self.branch, page_size=1)
+        )
+        logger.info("Environment verified: GCS bucket and Vertex AI Search data store reachable")
+
+    async def run_ingestion(self):
+        """
+        Main entry point to run the batch ingestion.
+
+        SYSTEM DESIGN NOTE: Per-Stage Concurrency
+        -----------------------------------------
+        Patterns are processed concurrently, but the two halves of the work are
+        throttled independently because they saturate different resources:
+        - Fetch (SharePoint page HTML): network-bound, run by `fetch_concurrency`
+          fetcher tasks (default min(32, 4 * ncpu)).
+        - Transform (parse, describe diagrams, upload, index): run by
+          `transform_concurrency` transformer tasks (default ncpu).
+        A single shared limit would either starve the network or oversubscribe
+        the CPU. Blocking client calls run on a thread pool sized for both stages.
+
+        The stages are connected by a bounded queue of prefetched pages, so
+        SharePoint fetches for upcoming patterns overlap the Gemini/GCS work of
+        earlier ones, but fetchers block once `fetch_concurrency` pages are
+        waiting. Fetched HTML held in memory therefore stays bounded however
+        many patterns the list contains.
 
-    def run_ingestion(self):
-        """Main entry point to run the batch ingestion."""
+        Transformed documents are indexed in batches of IMPORT_BATCH_SIZE with one
+        ImportDocuments call each, rather than one write per pattern. A full batch
+        is imported in the background so transformers keep working while the
+        operation completes; at most IMPORT_CONCURRENCY imports are in flight, and
+        a transformer that fills another batch waits for a free slot.
+        """
         logger.info("Starting Vertex AI Search ingestion...")
-        
+
+        # Size the default executor so the fetch semaphore is not silently
+        # capped by asyncio's default thread count. It is shut down when the
+        # run ends, so repeated runs do not leak idle worker threads.
+        executor = ThreadPoolExecutor(
+            max_workers=self.fetch_concurrency + self.transform_concurrency + IMPORT_CONCURRENCY
+        )
+        asyncio.get_running_loop().set_default_executor(executor)
+        try:
+            await self._run_stages()
+        finally:
+            executor.shutdown(wait=False)
+
+    async def _run_stages(self):
+        """Runs the fetch -> transform -> import stages over the whole pattern list."""
         # 1. Fetch all patterns from SharePoint List
-        patterns = self.sp_client.fetch_pattern_list()
-        
-        for pattern in patterns:
-            try:
-                self.process_single_pattern(pattern)
-            except Exception as e:
-                logger.error(f"Failed to process pattern {pattern['id']}: {e}", exc_info=True)
+        patterns = await asyncio.to_thread(self.sp_client.fetch_pattern_list)
+
+        # Transformed documents wait here until a full ImportDocuments batch is ready.
+        self._pending_index = []
+        self._import_slots = asyncio.Semaphore(IMPORT_CONCURRENCY)
+        self._import_tasks = set()
+
+        # Fetchers share one iterator, so each pattern is fetched exactly once.
+        pending_patterns = iter(patterns)
+        prefetched: asyncio.Queue = asyncio.Queue(maxsize=self.fetch_concurrency)
+
+        async def fetcher():
+            for pattern_meta in pending_patterns:
+                fetched = await self._fetch_stage(pattern_meta)
+                if fetched is not None:
+                    await prefetched.put(fetched)
+
+        async def transformer():
+            while True:
+                fetched = await prefetched.get()
+                if fetched is None:
+                    return
+                await self._transform_stage(*fetched)
+
+        transformers = [asyncio.create_task(transformer()) for _ in range(self.transform_concurrency)]
+        await asyncio.gather(*(fetcher() for _ in range(self.fetch_concurrency)))
+        for _ in transformers:
+            await prefetched.put(None)
+        await asyncio.gather(*transformers)
+        await self._flush_index_batch()
+        await asyncio.gather(*self._import_tasks)
+
+    async def _fetch_stage(self, pattern_meta: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], str, str]]:
+        """
+        Fetches one pattern's page; returns (pattern_meta, raw_html, content_hash) to
+        transform, or None if the page is empty, unchanged, or failed to fetch.
+        """
+        try:
+            # Hashing a whole page is CPU work; it runs on the fetch thread
+            # rather than stalling the event loop between awaits.
+            def fetch_and_hash():
+                raw_html = self._fetch_pattern_html(pattern_meta)
+                return raw_html, _content_hash(raw_html, pattern_meta) if raw_html else None
+
+            raw_html, content_hash = await asyncio.to_thread(fetch_and_hash)
+            if not raw_html:
+                return None
+
+            # Change Data Capture: content identical to the last completed run
+            # is already indexed, so skip the whole transform/index stage.
+            stored_hash = self.checkpoint.stored_hash(pattern_meta['id']) if self.checkpoint else None
+            if stored_hash and stored_hash == content_hash:
+                logger.info(f"Skipping pattern {pattern_meta['id']}: content unchanged ({content_hash})")
+                return None
+            return pattern_meta, raw_html, content_hash
+        except Exception as e:
+            logger.error(f"Failed to process pattern {pattern_meta['id']}: {e}", exc_info=True)
+            return None
+
+    async def _transform_stage(self, pattern_meta: Dict[str, Any], raw_html: str, content_hash: str):
+        """Transforms one fetched pattern and queues its document for batched indexing."""
+        try:
+            document = await asyncio.to_thread(self._transform_pattern, pattern_meta, raw_html)
+
+            self._pending_index.append((document, content_hash))
+            if len(self._pending_index) >= IMPORT_BATCH_SIZE:
+                await self._flush_index_batch()
+        except Exception as e:
+            logger.error(f"Failed to process pattern {pattern_meta['id']}: {e}", exc_info=True)
+
+    async def _flush_index_batch(self):
+        """
+        Starts importing the pending documents as a background task.
+
+        Waits only for a free import slot, not for the import itself.
+        """
+        batch, self._pending_index = self._pending_index, []
+        if not batch:
+            return
+        await self._import_slots.acquire()
+        task = asyncio.create_task(self._import_batch(batch))
+        self._import_tasks.add(task)
+        task.add_done_callback(self._import_tasks.discard)
+
+    async def _import_batch(self, batch: List[Tuple[discoveryengine.Document, str]]):
+        """
+        Imports one batch in one ImportDocuments call, then checkpoints it.
+
+        Patterns are only marked completed once their own document is known to be
+        indexed. A failed import, or a document the import rejected, is left out of
+        the checkpoint and retried on the next run.
+        """
+        documents = [document for document, _ in batch]
+        try:
+            # The operation is polled from the event loop instead of blocking a
+            # worker thread in operation.result() until the import finishes.
+            operation = await asyncio.to_thread(self._start_import, documents)
+            while not await asyncio.to_thread(operation.done):
+                await asyncio.sleep(IMPORT_POLL_SECONDS)
+            response = await asyncio.to_thread(operation.result)  # raises if the import failed
+        except Exception as e:
+            logger.error(f"Failed to import batch of {len(batch)} documents: {e}", exc_info=True)
+            return
+        finally:
+            self._import_slots.release()
+
+        failed_ids = failed_document_ids((d.id for d in documents), response, operation.metadata)
+        if failed_ids is None:
+            # Some failures could not be matched to a document, so each one is
+            # written on its own to learn which of them are actually indexed.
+            logger.warning(
+                f"Import of {len(documents)} documents reported failures that name no "
+                f"document; writing the batch one document at a time."
+            )
+            failed_ids = set()
+            for document in documents:
+                try:
+                    await asyncio.to_thread(self._index_document, document)
+                except Exception as e:
+                    logger.error(f"Failed to index document {document.id}: {e}")
+                    failed_ids.add(document.id)
+
+        if failed_ids:
+            logger.error(
+                f"{len(failed_ids)} of {len(documents)} documents failed to import and "
+                f"will be retried on the next run: {', '.join(sorted(failed_ids))}"
+            )
+        indexed = [(document, content_hash) for document, content_hash in batch if document.id not in failed_ids]
+        if indexed:
+            logger.info(f"Successfully indexed {len(indexed)} documents: {', '.join(d.id for d, _ in indexed)}")
+
+        if self.checkpoint:
+            def mark_batch_completed():
+                for document, content_hash in indexed:
+                    self.checkpoint.mark_completed(document.id, content_hash)
+            await asyncio.to_thread(mark_batch_completed)
 
     def process_single_pattern(self, pattern_meta: Dict[str, Any]):
         """
@@ -84,6 +417,13 @@ class VertexSearchPipeline:
         - Stream B (Diagrams): Now processed via 'gemini-1.5-flash' and descriptions injected into HTML.
         - Stream C (Text): Content is now kept as HTML (no manual chunking) and sent to Vertex.
         """
+        raw_html = self._fetch_pattern_html(pattern_meta)
+        if not raw_html:
+            return
+        self._index_document(self._transform_pattern(pattern_meta, raw_html))
+
+    def _fetch_pattern_html(self, pattern_meta: Dict[str, Any]) -> str:
+        """Fetch stage: downloads the raw page HTML from SharePoint."""
         logger.info(f"Processing pattern: {pattern_meta['title']} ({pattern_meta['id']})")
         
         # 1. Fetch raw HTML content
@@ -91,74 +431,191 @@ class VertexSearchPipeline:
         raw_html = self.sp_client.fetch_page_html(pattern_meta['page_url'])
         if not raw_html:
             logger.warning(f"No HTML content found for {pattern_meta['title']}")
-            return
+        return raw_html
+
+    def _transform_pattern(self, pattern_meta: Dict[str, Any], raw_html: str) -> discoveryengine.Document:
+        """Transform stage: diagrams -> descriptions and HTML enrichment; returns the Document to index."""
+        # Without an <img> there is nothing to describe, upload or inject, so the
+        # page is indexed as fetched instead of being parsed and re-serialized.
+        if not _IMG_TAG_RE.search(raw_html):
+            return self._build_document(pattern_meta, raw_html.encode("utf-8"))
+
+        # The page is parsed once; both steps below mutate the same tree, and it is
+        # serialized a single time for indexing.
+        root = lxml_html.document_fromstring(raw_html)
 
         # 2. Extract Images, Store in GCS, Generate Descriptions
-        # Returns: Modified HTML (with new GCS Links) and the generated descriptions
+        # Rewrites image links to GCS in place and returns the generated descriptions
         # CRITICAL: This step turns visual data (diagrams) into text (descriptions) so RAG can retrieve it.
-        updated_html, image_descriptions = self._process_images(raw_html, pattern_meta['id'])
+        image_descriptions = self._process_images(root, pattern_meta['id'])
         
         # 3. Enrich HTML with Descriptions
         # We inject the LLM-generated descriptions back into the HTML so the search engine indexes them together.
-        final_html = self._enrich_html_content(updated_html, image_descriptions)
+        self._enrich_html_content(root, image_descriptions)
         
-        # 4. Map Metadata & Push to Vertex AI Search
-        self._index_document(pattern_meta, final_html)
+        # 4. Map Metadata to a Vertex AI Search Document (indexed by the caller)
+        # lxml serializes straight to UTF-8 bytes in C: no intermediate str(soup)
+        # and no separate .encode() copy of the whole page.
+        return self._build_document(pattern_meta, lxml_html.tostring(root, encoding="utf-8"))
 
-    def _process_images(self, html_content: str, pattern_id: str) -> Tuple[str, List[str]]:
+    def _process_images(self, root: lxml_html.HtmlElement, pattern_id: str) -> List[str]:
         """
-        Parses HTML, finds first 2 images, uploads to GCS, interprets with LLM, 
-        and updates HTML src attributes.
+        Finds the first 2 images in the parsed page, uploads to GCS, interprets with LLM, 
+        and updates their src attributes in place.
 
         Why only first 2 images?
         - In our SharePoint pattern template, Image 1 is the 'Component Diagram' and Image 2 is the 'Sequence Diagram'.
         - Processing all images would be costly and less relevant.
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        images = soup.find_all('img')
         descriptions = []
         
-        # Limit to first 2 images (Component & Sequence diagrams typically)
-        target_images = images[:2]
+        # Limit to first 2 images (Component & Sequence diagrams typically).
+        # Icons/thumbnails and images without a src are skipped up front so they
+        # neither cost a download nor take a diagram slot; islice stops the
+        # icon checks at the second diagram.
+        target_images = list(islice((img for img in _IMG_WITH_SRC(root) if not _is_icon(img)), 2))
         
+        # A. Download from SharePoint (all images in parallel, each src once)
+        pending_downloads = []
+        downloads_by_src = {}
         for idx, img_tag in enumerate(target_images):
             original_src = img_tag.get('src')
-            if not original_src:
-                continue
+            # Per-image progress is debug detail; lazy args skip formatting when filtered.
+            logger.debug("Processing image %d/2 for pattern %s...", idx + 1, pattern_id)
+            if original_src not in downloads_by_src:
+                downloads_by_src[original_src] = self.image_io_pool.submit(self.sp_client.download_image, original_src)
+            pending_downloads.append((idx, img_tag, original_src, downloads_by_src[original_src]))
 
-            logger.info(f"Processing image {idx+1}/2 for pattern {pattern_id}...")
-
-            # A. Download from SharePoint
+        downloaded = []
+        for idx, img_tag, original_src, future in pending_downloads:
             try:
-                image_data = self.sp_client.download_image(original_src)
+                image_data = future.result()
                 if not image_data:
                     logger.warning(f"Empty image data for {original_src}")
                     continue
             except Exception as e:
                 logger.warning(f"Failed to download image {original_src}: {e}")
                 continue
+            downloaded.append((idx, img_tag, image_data))
 
-            # B. Generate Description using Gemini
-            try:
-                description = self._generate_image_description(image_data)
+        if not downloaded:
+            return descriptions
+
+        # Diagrams are content-addressed: identical images share one GCS object
+        # and one description, across patterns and across runs.
+        blob_names = [
+            f"patterns/diagrams/{hashlib.sha256(image_data).hexdigest()}.png"
+            for _, _, image_data in downloaded
+        ]
+
+        # C1. Look up the stored objects. A diagram ingested by any earlier run
+        # already exists and carries its description in the object metadata.
+        stored = list(self.image_io_pool.map(self._get_stored_diagram, blob_names))
+
+        # B. Generate Descriptions using Gemini (one request for all diagrams
+        # described neither earlier in this run nor in GCS; a diagram repeated
+        # on the page is described once)
+        with self._description_cache_lock:
+            generated = [self._description_cache.get(name) for name in blob_names]
+        for i, blob in enumerate(stored):
+            if generated[i] is None and blob is not None and blob.metadata:
+                generated[i] = blob.metadata.get("description")
+        missing = [i for i, description in enumerate(generated) if description is None]
+        if missing:
+            first_missing = {}
+            for i in missing:
+                first_missing.setdefault(blob_names[i], i)
+            fresh = dict(zip(
+                first_missing,
+                self._generate_image_descriptions([downloaded[i][2] for i in first_missing.values()]),
+            ))
+            for i in missing:
+                generated[i] = fresh[blob_names[i]]
+        with self._description_cache_lock:
+            for name, description in zip(blob_names, generated):
+                if description:
+                    self._description_cache[name] = description
+
+        # C2. Upload new diagrams with their description, whether it is fresh or
+        # memoized earlier in this run (another pattern may still be uploading
+        # the same object); record it on diagrams stored without one.
+        uploads = {}
+        for i, ((_, _, image_data), name, blob) in enumerate(zip(downloaded, blob_names, stored)):
+            if name in uploads:
+                continue
+            description = generated[i]
+            if blob is None:
+                uploads[name] = self.image_io_pool.submit(self._upload_to_gcs, image_data, name, description)
+            else:
+                if description and not (blob.metadata or {}).get("description"):
+                    self.image_io_pool.submit(self._store_description, blob, description)
+                uploads[name] = None
+
+        for (idx, img_tag, image_data), name, description in zip(downloaded, blob_names, generated):
+            upload = uploads[name]
+            if description:
                 descriptions.append(f"Diagram {idx+1} Description: {description}")
-            except Exception as e:
-                logger.warning(f"LLM description failed: {e}")
+            else:
                 descriptions.append("Diagram Description: [Analysis Failed]")
 
-            # C. Upload to GCS
             try:
-                blob_name = f"patterns/{pattern_id}/images/diag_{idx}.png"
-                gcs_url = self._upload_to_gcs(image_data, blob_name)
+                gcs_url = upload.result() if upload else self._public_url(name)
 
                 # D. Replace src in HTML
-                img_tag['src'] = gcs_url
+                img_tag.set('src', gcs_url)
                 # Add alt text for accessibility/searchability
-                img_tag['alt'] = description if description else "Pattern Diagram"
+                img_tag.set('alt', description if description else "Pattern Diagram")
             except Exception as e:
                  logger.warning(f"Failed to upload image or update HTML: {e}")
 
-        return str(soup), descriptions
+        return descriptions
+
+    def _generate_image_descriptions(self, images: List[bytes]) -> List[Optional[str]]:
+        """
+        Describes several diagrams with a single multimodal Gemini request.
+
+        Two diagrams per page would otherwise pay the request round-trip and
+        time-to-first-token twice. The model returns a JSON array (enforced via
+        response_mime_type/response_schema) with one entry per diagram; if that
+        cannot be parsed, each image is described with its own request.
+        Entries are None where a description could not be generated.
+        """
+        if len(images) > 1:
+            prompt = f"""
+        Analyze each of the {len(images)} technical architecture diagrams that follow, in order.
+        For each, provide a detailed textual description of the components, relationships, and flow depicted.
+        Focus on technical accuracy as this is for a RAG knowledge base.
+        Return a JSON array with one object per diagram: {{"diagram": <1-based number>, "description": "..."}}.
+        """
+            parts = [prompt] + [Part.from_data(data=image_bytes, mime_type="image/png") for image_bytes in images]
+            try:
+                response = self.vision_model.generate_content(
+                    parts,
+                    generation_config={
+                        "max_output_tokens": 512 * len(images),
+                        "temperature": 0.2,
+                        "response_mime_type": "application/json",
+                        "response_schema": _DIAGRAM_DESCRIPTIONS_SCHEMA,
+                    }
+                )
+                by_number = {
+                    int(entry["diagram"]): entry["description"]
+                    for entry in json.loads(response.text)
+                }
+                if all(by_number.get(n) for n in range(1, len(images) + 1)):
+                    return [by_number[n] for n in range(1, len(images) + 1)]
+                logger.warning("Batched diagram description was incomplete; describing images individually")
+            except Exception as e:
+                logger.warning(f"Batched diagram description failed ({e}); describing images individually")
+
+        generated = []
+        for image_bytes in images:
+            try:
+                generated.append(self._generate_image_description(image_bytes))
+            except Exception as e:
+                logger.warning(f"LLM description failed: {e}")
+                generated.append(None)
+        return generated
 
     def _generate_image_description(self, image_bytes: bytes) -> str:
         """
@@ -178,65 +635,101 @@ class VertexSearchPipeline:
         )
         return response.text
 
-    def _upload_to_gcs(self, image_data: bytes, blob_name: str) -> str:
+    def _get_stored_diagram(self, blob_name: str) -> Optional[storage.Blob]:
+        """
+        Fetches a diagram object's metadata, or None if it is not stored yet.
+
+        A failed lookup is treated as a miss; the diagram is then re-described
+        and the upload's generation precondition keeps the stored copy intact.
+        """
+        try:
+            return self.bucket.get_blob(blob_name)
+        except Exception as e:
+            logger.warning(f"Failed to look up {blob_name}: {e}")
+            return None
+
+    def _upload_to_gcs(self, image_data: bytes, blob_name: str, description: Optional[str] = None) -> str:
         """
         Uploads bytes to GCS and returns the public URL.
+
+        Blob names are content hashes, so the caller only uploads diagrams that
+        are not stored yet. if_generation_match=0 keeps two patterns racing on the
+        same diagram from both writing it. The description travels in the same
+        request as object metadata, where later runs find it; if the object won
+        the race without one, the description is patched onto it.
         """
         blob = self.bucket.blob(blob_name)
-        blob.upload_from_string(image_data, content_type="image/png")
-        
-        # Construct path (assuming bucket is either public or accessible via signed URL logic)
-        # Using standard storage.googleapis.com format
-        return f"https://storage.googleapis.com/{self.bucket.name}/{blob_name}"
+        # Diagrams are served straight from the public URL below; let caches keep them.
+        blob.cache_control = "public, max-age=3600"
+        if description and len(description.encode("utf-8")) <= _MAX_STORED_DESCRIPTION_BYTES:
+            blob.metadata = {"description": description}
+        # Single-request upload from the existing buffer (BytesIO wraps it without
+        # copying); checksum=None skips hashing the whole payload client-side.
+        try:
+            blob.upload_from_file(
+                BytesIO(image_data), content_type="image/png", checksum=None, if_generation_match=0
+            )
+        except PreconditionFailed:
+            # Uploaded concurrently by another pattern; same bytes.
+            if blob.metadata:
+                stored = self._get_stored_diagram(blob_name)
+                if stored is not None and not (stored.metadata or {}).get("description"):
+                    self._store_description(stored, description)
+
+        return self._public_url(blob_name)
+
+    def _store_description(self, blob: storage.Blob, description: str):
+        """Records a newly generated description on an already stored diagram."""
+        if len(description.encode("utf-8")) > _MAX_STORED_DESCRIPTION_BYTES:
+            return
+        try:
+            blob.metadata = {"description": description}
+            blob.patch()
+        except Exception as e:
+            logger.warning(f"Failed to store description on {blob.name}: {e}")
+
+    def _public_url(self, blob_name: str) -> str:
+        # Assumes the bucket is public (or fronted by signed URL logic).
+        # Blob.public_url builds the storage.googleapis.com URL locally and
+        # percent-encodes the object name.
+        return self.bucket.blob(blob_name).public_url
 
-    def _enrich_html_content(self, html_content: str, descriptions: List[str]) -> str:
+    def _enrich_html_content(self, root: lxml_html.HtmlElement, descriptions: List[str]):
         """
-        Injects the generated descriptions as the first section of the HTML.
+        Injects the generated descriptions as the first section of the HTML (in place).
         """
         if not descriptions:
-            return html_content
-
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Create a new div container for our AI-generated context
-        ai_context_div = soup.new_tag("div", attrs={"class": "ai-generated-context", "style": "background-color: #f0f0f0; padding: 15px; margin-bottom: 20px;"})
-        
-        header = soup.new_tag("h2")
-        header.string = "AI Generated Diagram Descriptions"
-        ai_context_div.append(header)
+            return
         
-        for desc in descriptions:
-            p = soup.new_tag("p")
-            p.string = desc
-            ai_context_div.append(p)
-            
-        # Prepend to body or beginning of parsed fragment
-        if soup.body:
-            soup.body.insert(0, ai_context_div)
+        # Format the AI-generated context block as markup and parse that small
+        # fragment once, rather than building it node by node with new_tag().
+        ai_html = (
+            '<div class="ai-generated-context" style="background-color: #f0f0f0; padding: 15px; margin-bottom: 20px;">'
+            '<h2>AI Generated Diagram Descriptions</h2>'
+            + "".join(f"<p>{html.escape(desc)}</p>" for desc in descriptions)
+            + '</div>'
+        )
+        ai_context_div = lxml_html.fragment_fromstring(ai_html)
+
+        # Prepend to body or beginning of parsed document
+        body = root.find('body')
+        if body is not None:
+            body.insert(0, ai_context_div)
         else:
-            soup.insert(0, ai_context_div)
-            
-        return str(soup)
+            root.insert(0, ai_context_div)
 
-    def _index_document(self, metadata: Dict[str, Any], html_content: str):
+    def _build_document(self, metadata: Dict[str, Any], html_content: bytes) -> discoveryengine.Document:
         """
-        Pushes the structured data and content to Vertex AI Search.
+        Maps a pattern's metadata and enriched HTML to a Vertex AI Search Document.
         
         SYSTEM DESIGN NOTE: Vertex AI Search Data Model
         -----------------------------------------------
         We use the 'Unstructured Data with Metadata' model.
-        - 'content': The enriched HTML blob. The engine will handle chunking, embedding, and indexing of this text.
+        - 'content': The enriched HTML blob (UTF-8 bytes). The engine will handle chunking, embedding, and indexing of this text.
         - 'struct_data': Key-value pairs used strictly for filtering (e.g., "Maturity: Production").
         
         Unlike Vector Search, we do NOT manage embeddings manually here.
         """
-        parent = self.doc_client.branch_path(
-            project=self.project_id,
-            location=self.location,
-            data_store=self.data_store_id,
-            branch="default_branch",
-        )
-
         # 1. Structure the Metadata (Stream A)
         # Vertex Search matches these keys against the schema defined in the Data Store
         struct_data = {
@@ -252,23 +745,58 @@ class VertexSearchPipeline:
 
         # 2. Create the Document Object
         # Note: We provide both 'struct_data' (for filtering) and 'content' (for vectorization/RAG)
-        document = discoveryengine.Document(
+        return discoveryengine.Document(
             id=metadata["id"],
             struct_data=struct_data,
             content=discoveryengine.Document.Content(
                 mime_type="text/html",
-                raw_bytes=html_content.encode("utf-8")
+                raw_bytes=html_content
             )
         )
 
-        # 3. Write Document (Update/Upsert)
-        request = discoveryengine.WriteDocumentRequest(
-            parent=parent,
-            document=document
+    @cached_property
+    def branch(self) -> str:
+        """Resource name of the data store's default branch, built once."""
+        return self.doc_client.branch_path(
+            project=self.project_id,
+            location=self.location,
+            data_store=self.data_store_id,
+            branch="default_branch",
+        )
+
+    def _index_document(self, document: discoveryengine.Document):
+        """
+        Writes a single document as an upsert; used by process_single_pattern and
+        to recover documents from an import whose failures name no document.
+
+        UpdateDocument addresses the document by its full resource name, and
+        allow_missing creates it when it is not indexed yet.
+        """
+        document.name = f"{self.branch}/documents/{document.id}"
+        request = discoveryengine.UpdateDocumentRequest(
+            document=document,
+            allow_missing=True
         )
 
-        self.doc_client.write_document(request=request)
-        logger.info(f"Successfully indexed document: {metadata['id']}")
+        self.doc_client.update_document(request=request)
+        logger.info(f"Successfully indexed document: {document.id}")
+
+    def _start_import(self, documents: List[discoveryengine.Document]):
+        """
+        Starts upserting a batch of documents with one ImportDocuments call and
+        returns its long-running operation.
+
+        INCREMENTAL reconciliation adds/updates the given documents and leaves
+        the rest of the data store untouched, so successive batches compose.
+        """
+        request = discoveryengine.ImportDocumentsRequest(
+            parent=self.branch,
+            inline_source=discoveryengine.ImportDocumentsRequest.InlineSource(
+                documents=documents
+            ),
+            reconciliation_mode=discoveryengine.ImportDocumentsRequest.ReconciliationMode.INCREMENTAL
+        )
+        return self.doc_client.import_documents(request=request)
 
 if __name__ == "__main__":
     # 0. Load Environment Variables from .env file
@@ -286,22 +814,28 @@ if __name__ == "__main__":
     # 2. Local Imports (now resolvable)
     from config import Config
     from clients.sharepoint import SharePointClient
+    from clients.gcp import get_gcp_clients
+    from checkpoint import CheckpointLog
+    from logging_config import configure_logging
 
-    # 3. Configure Logging
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # 3. Configure Logging (queued, so workers never block on stderr)
+    configure_logging(logging.INFO)
     
+    checkpoint = None
     try:
         logger.info("Initializing Vertex Search Pipeline...")
         
         # 4. Initialize Configuration & Clients
+        # Config() validates every required variable (including GCP_PROJECT_ID,
+        # GCS_IMAGE_BUCKET and VERTEX_SEARCH_DS_ID) and raises ConfigurationError.
         config = Config()
-        
-        # Validate critical inputs
-        if not all([config.PROJECT_ID, config.GCS_BUCKET, config.SEARCH_DATA_STORE_ID]):
-             logger.error("Missing required Env variables: GCP_PROJECT_ID, GCS_IMAGE_BUCKET, or VERTEX_SEARCH_DS_ID")
-             sys.exit(1)
 
         sp_client = SharePointClient(config)
+        gcp_clients = get_gcp_clients(config.PROJECT_ID)
+        checkpoint = (
+            CheckpointLog(config.INGEST_CHECKPOINT_DIR)
+            if config.INGEST_CHECKPOINT_DIR else None
+        )
         
         # 5. Instantiate Pipeline
         pipeline = VertexSearchPipeline(
@@ -309,11 +843,28 @@ if __name__ == "__main__":
             project_id=config.PROJECT_ID,
             location=config.LOCATION,
             data_store_id=config.SEARCH_DATA_STORE_ID,
-            gcs_bucket_name=config.GCS_BUCKET
+            gcs_bucket_name=config.GCS_BUCKET,
+            fetch_concurrency=config.FETCH_CONCURRENCY,
+            transform_concurrency=config.TRANSFORM_CONCURRENCY,
+            checkpoint=checkpoint,
+            clients=gcp_clients
         )
+
+        # Fail fast on missing access, warming the shared clients as we go
+        pipeline.verify_environment()
         
         # 6. Run
-        pipeline.run_ingestion()
+        # uvloop (libuv-based event loop) makes the gather/semaphore scheduling
+        # cheaper; fall back to the stdlib loop where it is not installed.
+        try:
+            import uvloop
+            run = uvloop.run
+        except ImportError:
+            run = asyncio.run
+        run(pipeline.run_ingestion())
         
     except Exception as e:
         logger.error(f"Pipeline execution failed: {e}", exc_info=True)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
@@ -0,0 +1,62 @@
+"""Tests for the append-only ingestion checkpoint log.
+
+Run: python -m pytest ingestion-service/tests/test_checkpoint.py
+"""
+
+import os
+import sys
+
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _SERVICE_ROOT)
+
+from checkpoint import CheckpointLog  # noqa: E402
+
+
+def _reopen(log: CheckpointLog, checkpoint_dir) -> CheckpointLog:
+    log.close()
+    return CheckpointLog(str(checkpoint_dir))
+
+
+def test_completions_survive_a_restart(tmp_path):
+    log = CheckpointLog(str(tmp_path))
+    log.mark_completed("p1", "aaaa")
+    log.mark_completed("p2", "bbbb")
+    log.mark_completed("p1", "cccc")  # re-ingested with new content
+
+    log = _reopen(log, tmp_path)
+    assert log.stored_hash("p1") == "cccc"
+    assert log.stored_hash("p2") == "bbbb"
+    assert log.stored_hash("p3") is None
+    assert log.is_completed("p2")
+    log.close()
+
+
+def test_unchanged_completion_is_not_rewritten(tmp_path):
+    log = CheckpointLog(str(tmp_path))
+    log.mark_completed("p1", "aaaa")
+    log.mark_completed("p1", "aaaa")
+    log.close()
+
+    with open(log.path, "rb") as f:
+        assert f.read() == b"p1\taaaa\n"
+
+
+def test_torn_trailing_line_is_discarded_and_truncated(tmp_path):
+    log = CheckpointLog(str(tmp_path))
+    log.mark_completed("p1", "aaaa")
+    log.close()
+    # A crash mid-write leaves a final entry without its newline.
+    with open(log.path, "ab") as f:
+        f.write(b"p2\tbb")
+
+    log = CheckpointLog(str(tmp_path))
+    assert log.stored_hash("p1") == "aaaa"
+    assert not log.is_completed("p2")
+    with open(log.path, "rb") as f:
+        assert f.read() == b"p1\taaaa\n"
+
+    # New entries start on a clean line after recovery.
+    log.mark_completed("p2", "bbbb")
+    log = _reopen(log, tmp_path)
+    assert log.stored_hash("p2") == "bbbb"
+    log.close()
@@ -0,0 +1,226 @@
+"""Tests for the component catalog pipeline: the variables.tf scanner, blob
+fetching and the run-state short-circuit.
+
+Run: python -m pytest ingestion-service/tests/test_component_catalog_pipeline.py
+
+GitHub and Discovery Engine are replaced by in-memory fakes. The pipeline module
+imports the GitHub, AWS and Google Cloud clients at load time, so these tests are
+skipped where those dependencies are not installed.
+"""
+
+import hashlib
+import os
+import re
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _SERVICE_ROOT)
+
+catalog = pytest.importorskip("pipelines.component_catalog_pipeline_legacy")
+
+
+def test_scanner_reads_single_line_attributes():
+    variables = catalog._scan_terraform_variables(
+        'variable "instance_type" {\n'
+        '  type        = string\n'
+        '  description = "EC2 instance type"\n'
+        '  default     = "t3.micro"\n'
+        '}\n'
+        'variable "subnets" {\n'
+        '  type = list(string)\n'
+        '}\n'
+    )
+    assert variables == {
+        "instance_type": {"type": "string", "description": "EC2 instance type", "default": "t3.micro"},
+        "subnets": {"type": "list(string)", "description": "No description", "default": "<<REQUIRED>>"},
+    }
+
+
+def test_scanner_strips_trailing_comments():
+    variables = catalog._scan_terraform_variables(
+        'variable "port" {\n'
+        '  type        = number # inline comment\n'
+        '  description = "Listener port # not a comment" // trailing\n'
+        '  default     = 443 # https\n'
+        '}\n'
+    )
+    assert variables["port"] == {"type": "number", "description": "Listener port # not a comment", "default": 443}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        '  description = <<EOT\n  text\n  EOT\n',         # heredoc
+        '  default = "${var.prefix}-bucket"\n',              # interpolation
+        '  type = object({\n    name = string\n  })\n',      # multi-line type
+        '  /* type = number */\n  type = string\n',          # block comment
+        '  default = { name = "x" }\n',                      # HCL-syntax map
+    ],
+)
+def test_scanner_defers_to_hcl2_on_unsupported_syntax(body):
+    with pytest.raises(ValueError):
+        catalog._scan_terraform_variables(f'variable "v" {{\n{body}}}\n')
+
+
+@pytest.mark.parametrize("hcl2_type", ["${list(string)}", "list(string)"])
+def test_type_expression_matches_scanner_form(hcl2_type):
+    assert catalog._tf_type_expression(hcl2_type) == "list(string)"
+
+
+_PLAIN_VARIABLES = (
+    'variable "instance_type" {\n'
+    '  type        = string # inline comment\n'
+    '  description = "EC2 \\"instance\\" type"\n'
+    '  default     = "t3.micro"\n'
+    '}\n'
+    'variable "subnets" {\n'
+    '  type    = list(string)\n'
+    '  default = ["a", "b"]\n'
+    '}\n'
+    'variable "enabled" {\n'
+    '  default = true\n'
+    '}\n'
+)
+
+
+def test_scanner_and_hcl2_fallback_produce_the_same_schema():
+    assert catalog._parse_terraform_variables_hcl2(_PLAIN_VARIABLES) == catalog._scan_terraform_variables(_PLAIN_VARIABLES)
+
+
+def test_heredoc_variable_falls_back_to_hcl2_in_scanner_shape():
+    content = (
+        'variable "policy" {\n'
+        '  type        = map(string)\n'
+        '  description = <<EOT\n'
+        'Bucket policy, as "key = value" pairs.\n'
+        'EOT\n'
+        '}\n'
+    )
+    pipeline = catalog.ComponentCatalogPipeline.__new__(catalog.ComponentCatalogPipeline)
+
+    schema = pipeline._parse_terraform_variables("modules/s3/variables.tf", content)
+
+    assert schema["attributes"] == {
+        "policy": {
+            "type": "map(string)",
+            "description": 'Bucket policy, as "key = value" pairs.',
+            "default": "<<REQUIRED>>",
+        }
+    }
+
+
+class FakeRepo:
+    """A GitHub repository at one commit; *files* maps path -> (text, inlined by GraphQL)."""
+
+    full_name = "acme/infra"
+    html_url = "https://github.example/acme/infra"
+    default_branch = "main"
+
+    def __init__(self, files, truncated=False):
+        self.truncated = truncated
+        self.blobs = {
+            path: SimpleNamespace(
+                path=path, type="blob", size=len(text),
+                sha=hashlib.sha1(text.encode("utf-8")).hexdigest(),
+                text=text, inline=inline,
+            )
+            for path, (text, inline) in files.items()
+        }
+        self.rest_reads = []
+
+    def get_branch(self, name):
+        return SimpleNamespace(commit=SimpleNamespace(sha="c0ffee" * 6))
+
+    def get_git_tree(self, sha, recursive):
+        return SimpleNamespace(raw_data={"truncated": self.truncated}, tree=list(self.blobs.values()))
+
+    def get_contents(self, path, ref):
+        self.rest_reads.append(path)
+        return SimpleNamespace(decoded_content=self.blobs[path].text.encode("utf-8"))
+
+    def post_graphql(self, query):
+        by_sha = {blob.sha: blob for blob in self.blobs.values()}
+        nodes = {
+            alias: {"text": by_sha[sha].text if by_sha[sha].inline else None, "isTruncated": False}
+            for alias, sha in re.findall(r'(b\d+): object\(oid: "([0-9a-f]+)"\)', query)
+        }
+        return {"repository": nodes}
+
+
+class FakeDocumentService:
+    branch_path = staticmethod(catalog.discoveryengine.DocumentServiceClient.branch_path)
+    imported = []
+
+    def __init__(self, client_options=None):
+        pass
+
+    def import_documents(self, request):
+        FakeDocumentService.imported.append([doc.id for doc in request.inline_source.documents])
+        return SimpleNamespace(
+            operation=SimpleNamespace(name="operations/import"),
+            result=lambda: catalog.discoveryengine.ImportDocumentsResponse(),
+            metadata=catalog.discoveryengine.ImportDocumentsMetadata(),
+        )
+
+
+@pytest.fixture
+def make_pipeline(tmp_path, monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    monkeypatch.setenv("AWS_SERVICE_CATALOG_ENABLED", "false")
+    monkeypatch.setenv("CATALOG_CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv("CATALOG_STAGING_BUCKET", raising=False)
+    monkeypatch.setattr(catalog.discoveryengine, "DocumentServiceClient", FakeDocumentService)
+    FakeDocumentService.imported = []
+
+    def make(repo):
+        pipeline = catalog.ComponentCatalogPipeline()
+        pipeline.gh = SimpleNamespace(get_repo=lambda name: repo)
+        pipeline._post_graphql = repo.post_graphql
+        return pipeline
+    return make
+
+
+_MODULE_VARIABLES = 'variable "name" {\n  type = string\n}\n'
+
+
+def test_blob_not_inlined_by_graphql_is_read_over_rest(make_pipeline):
+    repo = FakeRepo({
+        "modules/vpc/variables.tf": (_MODULE_VARIABLES, True),
+        "modules/rds/variables.tf": (_MODULE_VARIABLES + "\n", False),
+    })
+    pipeline = make_pipeline(repo)
+
+    texts = pipeline._fetch_blob_texts(repo, "ref", list(repo.blobs.values()))
+
+    assert repo.rest_reads == ["modules/rds/variables.tf"]
+    assert texts == {path: blob.text for path, blob in repo.blobs.items()}
+
+
+def test_run_state_short_circuits_an_unchanged_repository(make_pipeline):
+    repo = FakeRepo({"modules/vpc/variables.tf": (_MODULE_VARIABLES, True)})
+
+    make_pipeline(repo).run()
+    make_pipeline(repo).run()
+
+    assert FakeDocumentService.imported == [["tf-vpc"]]
+    assert os.path.exists(os.path.join(make_pipeline(repo).state_dir, "run_state.json"))
+
+
+@pytest.mark.parametrize(
+    "files, truncated",
+    [
+        ({"modules/vpc/variables.tf": (_MODULE_VARIABLES, True)}, True),
+        ({"modules/vpc/variables.tf": ('variable "name" {\n  type = \n', True)}, False),
+    ],
+    ids=["truncated-tree", "parse-failure"],
+)
+def test_run_state_is_not_saved_after_an_incomplete_scan(make_pipeline, files, truncated):
+    repo = FakeRepo(files, truncated=truncated)
+    pipeline = make_pipeline(repo)
+
+    pipeline.run()
+
+    assert not os.path.exists(os.path.join(pipeline.state_dir, "run_state.json"))
@@ -0,0 +1,33 @@
+"""Tests for attributing ImportDocuments failures to document IDs.
+
+Run: python -m pytest ingestion-service/tests/test_indexing.py
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _SERVICE_ROOT)
+
+from indexing import failed_document_ids  # noqa: E402
+
+
+def _outcome(failure_count, *messages):
+    response = SimpleNamespace(error_samples=[SimpleNamespace(message=m) for m in messages])
+    return response, SimpleNamespace(failure_count=failure_count)
+
+
+def test_no_failures():
+    assert failed_document_ids(["p1", "p2"], *_outcome(0)) == set()
+
+
+def test_failures_named_by_samples():
+    outcome = _outcome(1, "Document p-1 has invalid struct_data")
+    # p-12 shares a prefix with p-1 but is not the rejected document.
+    assert failed_document_ids(["p-1", "p-12", "p-2"], *outcome) == {"p-1"}
+
+
+def test_more_failures_than_named_documents_is_unattributable():
+    assert failed_document_ids(["p1", "p2"], *_outcome(2, "Document p1 is too large")) is None
+    assert failed_document_ids(["p1", "p2"], *_outcome(1)) is None
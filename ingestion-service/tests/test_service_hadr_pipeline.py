@@ -0,0 +1,150 @@
+"""Tests for the HA/DR pipeline's section splitter and chunk import accounting.
+
+Run: python -m pytest ingestion-service/tests/test_service_hadr_pipeline.py
+
+_split_by_strategy_and_phase replaced a two-pass split (by DR strategy, then
+each strategy's text again by lifecycle phase); these tests pin it to that
+reference behaviour. Discovery Engine is replaced by an in-memory fake. The
+pipeline module imports the Google Cloud clients at load time, so the tests
+are skipped where those are not installed.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+from types import SimpleNamespace
+from typing import Dict, List
+
+import pytest
+
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _SERVICE_ROOT)
+
+hadr = pytest.importorskip("pipelines.service_hadr_pipeline")
+
+Pipeline = hadr.ServiceHADRIngestionPipeline
+
+
+def _split_by_heading(content: str, patterns) -> Dict[str, str]:
+    """The previous splitter, applied once per heading kind."""
+    sections: Dict[str, List[str]] = {"general": []}
+    current_key = "general"
+    for line in content.split("\n"):
+        current_key = Pipeline._detect_category(line, patterns) or current_key
+        sections.setdefault(current_key, []).append(line)
+    return {k: "\n".join(v) for k, v in sections.items() if v}
+
+
+def _two_pass_split(content: str) -> Dict[str, Dict[str, str]]:
+    return {
+        strategy: _split_by_heading(text, hadr._LIFECYCLE_PHASE_RES)
+        for strategy, text in _split_by_heading(content, hadr._DR_STRATEGY_RES).items()
+    }
+
+
+def _split(content: str) -> Dict[str, Dict[str, str]]:
+    # The splitter needs no instance state, so no clients are built.
+    return Pipeline._split_by_strategy_and_phase(Pipeline.__new__(Pipeline), content)
+
+
+def test_split_groups_lines_by_strategy_then_phase():
+    content = "\n".join([
+        "Overview of the service",
+        "## Backup and Restore",
+        "Snapshots are taken nightly.",
+        "### Failover",
+        "Restore the latest snapshot.",
+        "## Warm Standby",
+        "### Initial Provisioning",
+        "A scaled-down copy runs in the DR region.",
+    ])
+    assert _split(content) == {
+        "general": {"general": "Overview of the service"},
+        "Backup and Restore": {
+            "general": "## Backup and Restore\nSnapshots are taken nightly.",
+            "Failover": "### Failover\nRestore the latest snapshot.",
+        },
+        "Warm Standby": {
+            "general": "## Warm Standby",
+            "Initial Provisioning": "### Initial Provisioning\nA scaled-down copy runs in the DR region.",
+        },
+    }
+    assert _split(content) == _two_pass_split(content)
+
+
+def test_split_matches_two_pass_reference_on_random_headings():
+    lines = [
+        "## Backup and Restore", "## Pilot Light On Demand", "## Cold Standby",
+        "## Warm Standby", "### Initial Provisioning", "### Failover",
+        "### Failback", "plain text", "more plain text", "",
+    ]
+    rng = random.Random(0)
+    for _ in range(500):
+        content = "\n".join(rng.choice(lines) for _ in range(rng.randint(0, 30)))
+        assert _split(content) == _two_pass_split(content), content
+
+
+class FakeChunkImport:
+    """ImportDocuments stand-in: fails batches holding *failing_ids*, rejects *rejected* IDs."""
+
+    def __init__(self, failing_ids=(), rejected=()):
+        self.failing_ids = set(failing_ids)
+        self.rejected = list(rejected)
+
+    def import_documents(self, request):
+        ids = {document.id for document in request.inline_source.documents}
+        if ids & self.failing_ids:
+            raise RuntimeError("deadline exceeded")
+        rejected = [i for i in self.rejected if i in ids]
+        response = SimpleNamespace(
+            error_samples=[SimpleNamespace(message=f"Document {i} is invalid") for i in rejected]
+        )
+        return SimpleNamespace(
+            result=lambda: response,
+            metadata=SimpleNamespace(failure_count=len(rejected)),
+        )
+
+
+def _indexing_pipeline(doc_client):
+    return Pipeline(
+        sp_client=None, project_id="proj", location="global", data_store_id="ds",
+        clients=SimpleNamespace(documents=doc_client, storage=None), concurrency=1,
+    )
+
+
+def _chunks(count):
+    return [{"id": f"c{i}", "struct_data": {}, "content": "text"} for i in range(count)]
+
+
+def test_index_chunks_counts_rejected_and_failed_batches():
+    doc_client = FakeChunkImport(failing_ids={f"c{hadr.IMPORT_BATCH_SIZE}"}, rejected=["c3"])
+    pipeline = _indexing_pipeline(doc_client)
+
+    chunks = _chunks(hadr.IMPORT_BATCH_SIZE + 5)
+    # Batch 1 loses one rejected chunk; batch 2 (5 chunks) fails outright.
+    assert pipeline._index_chunks(chunks) == 1 + 5
+
+
+def test_service_with_no_indexed_chunks_is_reported_as_failed(caplog):
+    def import_documents(request):
+        raise RuntimeError("permission denied")
+
+    pipeline = _indexing_pipeline(SimpleNamespace(import_documents=import_documents))
+    pipeline.sp_client = SimpleNamespace(fetch_page_html=lambda url: "<p>Backup and restore</p>")
+
+    with caplog.at_level(logging.INFO, logger=hadr.logger.name):
+        pipeline._process_single_service({"service_name": "Amazon RDS", "page_url": "u"})
+
+    assert "Failed Amazon RDS: none of" in caplog.text
+    assert "Finished Amazon RDS" not in caplog.text
+
+
+def test_run_shuts_down_its_thread_pools():
+    pipeline = _indexing_pipeline(FakeChunkImport())
+    asyncio.run(pipeline.run_ingestion(service_list=[]))
+
+    for pool in (pipeline.index_pool, pipeline.image_pool):
+        with pytest.raises(RuntimeError):
+            pool.submit(print)
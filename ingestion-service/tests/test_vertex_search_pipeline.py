@@ -0,0 +1,271 @@
+"""Tests for the Vertex AI Search pattern pipeline's batched import and checkpointing.
+
+Run: python -m pytest ingestion-service/tests/test_vertex_search_pipeline.py
+
+SharePoint, GCS and Discovery Engine are replaced by in-memory fakes; no network
+calls are made. The pipeline module imports the Google Cloud clients at load
+time, so these tests are skipped where those are not installed.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+_SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _SERVICE_ROOT)
+
+vertex = pytest.importorskip("pipelines.vertex_search_pipeline")
+
+from google.api_core.exceptions import PreconditionFailed  # noqa: E402
+from google.cloud import discoveryengine_v1 as discoveryengine  # noqa: E402
+from google.rpc import status_pb2  # noqa: E402
+
+from checkpoint import CheckpointLog  # noqa: E402
+
+
+class FakeImportOperation:
+    """A finished ImportDocuments operation reporting *failure_count* rejected documents."""
+
+    def __init__(self, failure_count=0, error_messages=()):
+        self.metadata = discoveryengine.ImportDocumentsMetadata(failure_count=failure_count)
+        self._response = discoveryengine.ImportDocumentsResponse(
+            error_samples=[status_pb2.Status(code=3, message=m) for m in error_messages]
+        )
+
+    def done(self):
+        return True
+
+    def result(self):
+        return self._response
+
+
+class FakeDocumentClient:
+    branch_path = staticmethod(discoveryengine.DocumentServiceClient.branch_path)
+
+    def __init__(self, operation=None, rejected_updates=()):
+        self.operation = operation or FakeImportOperation()
+        self.rejected_updates = set(rejected_updates)
+        self.imported = []
+        self.updated = []
+
+    def import_documents(self, request):
+        self.imported.append([document.id for document in request.inline_source.documents])
+        return self.operation
+
+    def update_document(self, request):
+        assert request.allow_missing
+        if request.document.id in self.rejected_updates:
+            raise RuntimeError("rejected")
+        self.updated.append(request.document.name)
+        return request.document
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.metadata = None
+        self.cache_control = None
+        self.public_url = f"https://storage.example/{name}"
+
+    def upload_from_file(self, data, content_type, checksum, if_generation_match):
+        if if_generation_match == 0 and self.name in self.bucket.objects:
+            raise PreconditionFailed("object exists")
+        self.bucket.objects[self.name] = self
+
+    def patch(self):
+        self.bucket.objects[self.name].metadata = self.metadata
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name):
+        return self.objects.get(name)
+
+
+class FakeClients:
+    def __init__(self, documents, bucket=None):
+        self.documents = documents
+        self.storage = SimpleNamespace(bucket=lambda name: bucket)
+
+
+class FakeSharePoint:
+    def __init__(self, pages, images=None):
+        self.pages = pages
+        self.images = images or {}
+        self.downloads = []
+
+    def fetch_pattern_list(self):
+        return [{"id": pid, "title": pid, "page_url": pid} for pid in self.pages]
+
+    def fetch_page_html(self, page_url):
+        return self.pages[page_url]
+
+    def download_image(self, src):
+        self.downloads.append(src)
+        return self.images[src]
+
+
+class FakeVisionModel:
+    """Describes every diagram in a request as 'diagram <n>'; counts the requests."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def generate_content(self, parts, generation_config):
+        self.requests += 1
+        images = len(parts) - 1
+        if images == 1:
+            return SimpleNamespace(text="diagram 1")
+        return SimpleNamespace(
+            text=json.dumps([{"diagram": n, "description": f"diagram {n}"} for n in range(1, images + 1)])
+        )
+
+
+@pytest.fixture
+def vision_model(monkeypatch):
+    model = FakeVisionModel()
+    monkeypatch.setattr(vertex, "_vision_model", lambda project_id: model)
+    return model
+
+
+def _diagram_name(image_data):
+    return f"patterns/diagrams/{hashlib.sha256(image_data).hexdigest()}.png"
+
+
+def _page(*srcs):
+    return "<html><body>" + "".join(f'<img src="{src}" width="800">' for src in srcs) + "</body></html>"
+
+
+def _pipeline(doc_client, checkpoint=None, sp_client=None, bucket=None):
+    return vertex.VertexSearchPipeline(
+        sp_client=sp_client,
+        project_id="proj",
+        location="global",
+        data_store_id="ds",
+        gcs_bucket_name="bucket",
+        fetch_concurrency=2,
+        transform_concurrency=2,
+        checkpoint=checkpoint,
+        clients=FakeClients(doc_client, bucket),
+    )
+
+
+def _import(pipeline, batch):
+    async def run():
+        pipeline._import_slots = asyncio.Semaphore(1)
+        await pipeline._import_slots.acquire()
+        await pipeline._import_batch(batch)
+    asyncio.run(run())
+
+
+def _batch(*ids):
+    return [(discoveryengine.Document(id=i), f"hash-{i}") for i in ids]
+
+
+def test_unattributed_failures_are_resolved_one_document_at_a_time(tmp_path):
+    doc_client = FakeDocumentClient(FakeImportOperation(failure_count=1), rejected_updates={"p2"})
+    checkpoint = CheckpointLog(str(tmp_path))
+    pipeline = _pipeline(doc_client, checkpoint)
+
+    _import(pipeline, _batch("p1", "p2", "p3"))
+
+    assert doc_client.updated == [
+        f"{pipeline.branch}/documents/p1",
+        f"{pipeline.branch}/documents/p3",
+    ]
+    assert checkpoint.stored_hash("p1") == "hash-p1"
+    assert checkpoint.stored_hash("p2") is None
+    assert checkpoint.stored_hash("p3") == "hash-p3"
+    checkpoint.close()
+
+
+def test_memoized_description_is_stored_with_the_upload(vision_model):
+    image = b"component-diagram"
+    bucket = FakeBucket()
+    sp = FakeSharePoint({"p1": _page("a.png")}, {"a.png": image})
+    pipeline = _pipeline(FakeDocumentClient(), sp_client=sp, bucket=bucket)
+    # Described by an earlier pattern in this run whose upload has not landed yet.
+    pipeline._description_cache[_diagram_name(image)] = "memoized description"
+
+    pipeline._transform_pattern(sp.fetch_pattern_list()[0], sp.pages["p1"])
+
+    assert vision_model.requests == 0
+    assert bucket.objects[_diagram_name(image)].metadata == {"description": "memoized description"}
+
+
+def test_description_is_patched_onto_a_diagram_stored_without_one(vision_model):
+    image = b"component-diagram"
+    bucket = FakeBucket()
+    pipeline = _pipeline(FakeDocumentClient(), bucket=bucket)
+    # Another pattern won the upload race without a description.
+    bucket.blob(_diagram_name(image)).upload_from_file(None, "image/png", None, 0)
+
+    pipeline._upload_to_gcs(image, _diagram_name(image), "late description")
+
+    assert bucket.objects[_diagram_name(image)].metadata == {"description": "late description"}
+
+
+def _run(pipeline):
+    asyncio.run(pipeline.run_ingestion())
+
+
+def test_unchanged_patterns_are_skipped_after_their_import_is_checkpointed(tmp_path):
+    sp = FakeSharePoint({"p1": "<p>one</p>", "p2": "<p>two</p>"})
+    doc_client = FakeDocumentClient()
+    checkpoint = CheckpointLog(str(tmp_path))
+
+    _run(_pipeline(doc_client, checkpoint, sp))
+    sp.pages["p2"] = "<p>two, edited</p>"
+    _run(_pipeline(doc_client, checkpoint, sp))
+
+    assert [sorted(ids) for ids in doc_client.imported] == [["p1", "p2"], ["p2"]]
+    assert checkpoint.stored_hash("p2") == vertex._content_hash(
+        "<p>two, edited</p>", sp.fetch_pattern_list()[1]
+    )
+    checkpoint.close()
+
+
+def test_rejected_document_is_not_checkpointed_and_is_retried(tmp_path):
+    sp = FakeSharePoint({"p1": "<p>one</p>", "p2": "<p>two</p>"})
+    rejecting = FakeDocumentClient(FakeImportOperation(1, ["Document p2: invalid struct_data"]))
+    checkpoint = CheckpointLog(str(tmp_path))
+
+    _run(_pipeline(rejecting, checkpoint, sp))
+    assert checkpoint.is_completed("p1")
+    assert not checkpoint.is_completed("p2")
+
+    retry = FakeDocumentClient()
+    _run(_pipeline(retry, checkpoint, sp))
+    assert retry.imported == [["p2"]]
+    assert checkpoint.is_completed("p2")
+    checkpoint.close()
+
+
+def test_repeated_diagram_is_downloaded_per_src_and_described_once(vision_model):
+    image = b"component-diagram"
+    bucket = FakeBucket()
+    sp = FakeSharePoint(
+        {"p1": _page("a.png", "a.png"), "p2": _page("copy-of-a.png")},
+        {"a.png": image, "copy-of-a.png": image},
+    )
+    pipeline = _pipeline(FakeDocumentClient(), sp_client=sp, bucket=bucket)
+
+    for pattern_meta in sp.fetch_pattern_list():
+        document = pipeline._transform_pattern(pattern_meta, sp.pages[pattern_meta["id"]])
+        assert b"diagram 1" in document.content.raw_bytes
+
+    assert sp.downloads == ["a.png", "copy-of-a.png"]
+    assert vision_model.requests == 1
+    assert list(bucket.objects) == [_diagram_name(image)]
+    assert bucket.objects[_diagram_name(image)].metadata == {"description": "diagram 1"}